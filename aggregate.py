@@ -0,0 +1,144 @@
+"""
+aggregate.py - Single-pass streaming summary of hand outcomes.
+
+Hand scores are small non-negative integers, so an exact histogram of them
+takes O(distinct scores) memory no matter how many hands are added.  The
+running moments, bust and Flip 7 counts, and every quantile (read from the
+cumulative histogram) come with it, so the analysis scripts never need the
+individual scores.
+"""
+
+import numpy as np
+
+
+class ScoreAggregator:
+    """
+    Exact histogram and running totals of total_value, fed chunk by chunk
+    with update().  Aggregators of disjoint result sets combine with merge().
+    """
+
+    def __init__(self):
+        self.histogram = np.zeros(0, dtype=np.int64)
+        self.count = 0
+        self.sum = 0
+        self.sum_sq = 0
+        self.bust = 0
+        self.flip_seven = 0
+
+    def update(self, total_value, is_bust=None, is_flip_seven_bonus=None):
+        """Adds a chunk of hands (array-likes of equal length)."""
+        scores = np.asarray(total_value, dtype=np.int64)
+        if not len(scores):
+            return self
+        counts = np.bincount(scores)
+        self._add_histogram(counts)
+        self.count += int(len(scores))
+        self.sum += int(scores.sum())
+        self.sum_sq += int((scores * scores).sum())
+        if is_bust is not None:
+            self.bust += int(np.count_nonzero(is_bust))
+        if is_flip_seven_bonus is not None:
+            self.flip_seven += int(np.count_nonzero(is_flip_seven_bonus))
+        return self
+
+    def update_columns(self, columns):
+        """Adds columnar results (see store.COLUMNS)."""
+        return self.update(columns["total_value"], columns.get("is_bust"),
+                           columns.get("is_flip_seven_bonus"))
+
+    def merge(self, other):
+        """Adds the hands summarized by another aggregator."""
+        self._add_histogram(other.histogram)
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_sq += other.sum_sq
+        self.bust += other.bust
+        self.flip_seven += other.flip_seven
+        return self
+
+    def _add_histogram(self, counts):
+        if len(counts) > len(self.histogram):
+            self.histogram = np.pad(self.histogram, (0, len(counts) - len(self.histogram)))
+        self.histogram[:len(counts)] += counts
+
+    # --- Statistics ---------------------------------------------------------
+
+    def mean(self):
+        return self.sum / self.count
+
+    def variance(self):
+        """Population variance, as np.var."""
+        mean = self.mean()
+        return max(self.sum_sq / self.count - mean * mean, 0.0)
+
+    def std(self):
+        return self.variance() ** 0.5
+
+    def quantile(self, q):
+        """
+        Returns the q-quantile of the scores with np.quantile's default
+        (linear) interpolation between order statistics.
+        """
+        position = q * (self.count - 1)
+        lo = int(np.floor(position))
+        hi = int(np.ceil(position))
+        cumulative = np.cumsum(self.histogram)
+        lo_score = int(np.searchsorted(cumulative, lo, side="right"))
+        hi_score = int(np.searchsorted(cumulative, hi, side="right"))
+        return lo_score + (hi_score - lo_score) * (position - lo)
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def bust_rate(self):
+        return self.bust / self.count
+
+    def flip_seven_rate(self):
+        return self.flip_seven / self.count
+
+    def scores_and_counts(self):
+        """Returns ([score], [count]) for the scores that occurred."""
+        scores = np.flatnonzero(self.histogram)
+        return scores.tolist(), self.histogram[scores].tolist()
+
+    def pmf(self):
+        """Returns the empirical score PMF as an array indexed by score."""
+        return self.histogram / self.count
+
+    # --- Sidecar format -----------------------------------------------------
+
+    def to_summary(self):
+        """Returns the JSON-serializable summary dict (see store.py)."""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "sum_sq": self.sum_sq,
+            "histogram": self.histogram.tolist(),
+            "bust": self.bust,
+            "flip_seven": self.flip_seven,
+        }
+
+    @classmethod
+    def from_summary(cls, summary):
+        aggregator = cls()
+        aggregator.histogram = np.array(summary["histogram"], dtype=np.int64)
+        for field in ("count", "sum", "sum_sq", "bust", "flip_seven"):
+            setattr(aggregator, field, summary[field])
+        return aggregator
+
+
+def bin_edges(max_score, n_bins=30):
+    """
+    Returns integer histogram bin edges from 0 covering scores up to
+    max_score with about n_bins equal-width bins, for sharing across X.
+    """
+    width = max(1, -(-(max_score + 1) // n_bins))
+    return np.arange(0, max_score + width + 1, width)
+
+
+def bin_counts(scores, weights, edges):
+    """
+    Returns the total weight of scores in each [edges[i], edges[i + 1]) bin.
+    """
+    counts, _ = np.histogram(scores, bins=edges, weights=weights)
+    return counts
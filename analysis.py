@@ -0,0 +1,122 @@
+"""
+analysis.py - Shared data layer for analyze_results.py and generate_blog.py.
+
+Both report scripts load the per-X score aggregates and build the same kind
+of Plotly figures.  The aggregates and the built figure JSON are cached on
+disk under data/.analysis_cache, keyed by a fingerprint of their inputs:
+
+    data files (result stores, legacy JSONL, multisim results): size and mtime
+    source files (the scripts and the modules computing the data): content hash
+
+Summary sidecars are derived data and left out of the fingerprint.  When
+nothing in data/ or the code changed, a report only reads the cached JSON and
+renders its template, so a template-only change re-renders in well under a
+second.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+
+import aggregate
+import sim
+import store
+from aggregate import ScoreAggregator
+from sim import load_aggregate, get_sim_path, get_legacy_sim_path, DATA_DIR
+
+CACHE_DIR = os.path.join(DATA_DIR, ".analysis_cache")
+CACHE_VERSION = 1
+MAX_CACHE_ENTRIES = 4  # kept per cache name
+
+# Modules whose code determines the aggregates
+DATA_SOURCES = [__file__, aggregate.__file__, sim.__file__, store.__file__]
+
+
+def get_available_strategies():
+    """Finds all X values that have simulation data in the data directory."""
+    strategies = []
+    if not os.path.exists(DATA_DIR):
+        return strategies
+    for filename in os.listdir(DATA_DIR):
+        match = re.match(r"sim_results_(\d+)(\.jsonl)?$", filename)
+        if match:
+            strategies.append(int(match.group(1)))
+    return sorted(set(strategies))
+
+
+def simulation_inputs(x):
+    """
+    Returns the data files holding the simulation results for strategy X.
+    """
+    path = get_sim_path(x)
+    files = sorted(glob.glob(os.path.join(path, "*.bin")))
+    files.append(os.path.join(path, "schema.json"))
+    files.append(get_legacy_sim_path(x))
+    return files
+
+
+def fingerprint(data_files=(), sources=()):
+    """
+    Returns a hex digest of the size and mtime of each data file (missing
+    files included as such) and the contents of each source file or module.
+    """
+    digest = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    for path in data_files:
+        try:
+            stat = os.stat(path)
+            entry = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+        except FileNotFoundError:
+            entry = f"{path}:missing"
+        digest.update(entry.encode())
+    for source in sources:
+        path = getattr(source, "__file__", source)
+        with open(path, "rb") as f:
+            digest.update(os.path.basename(path).encode())
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def cached(name, build, data_files=(), sources=()):
+    """
+    Returns build()'s JSON-serializable result, from the cache if an entry
+    for name with the same input fingerprint exists.  Older entries for name
+    beyond MAX_CACHE_ENTRIES are evicted.
+    """
+    key = fingerprint(data_files, sources)
+    cache_path = os.path.join(CACHE_DIR, f"{name}-{key[:16]}.json")
+    try:
+        with open(cache_path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    value = build()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(value, f)
+    os.replace(tmp_path, cache_path)
+
+    entries = sorted(glob.glob(os.path.join(CACHE_DIR, f"{name}-*.json")), key=os.path.getmtime)
+    for stale in entries[:-MAX_CACHE_ENTRIES]:
+        os.remove(stale)
+    return value
+
+
+def load_aggregates(strategies):
+    """
+    Returns {x: ScoreAggregator} for the strategies that have results,
+    caching each one's summary under its own input fingerprint.
+    """
+    aggregators = {}
+    for x in strategies:
+        def build():
+            aggregator = load_aggregate(x)
+            return aggregator.to_summary() if aggregator else None
+
+        summary = cached(f"aggregate_{x}", build, simulation_inputs(x), DATA_SOURCES)
+        if summary is not None:
+            aggregators[x] = ScoreAggregator.from_summary(summary)
+    return aggregators
@@ -5,10 +5,11 @@ Creates an HTML page with a heatmap showing the optimal strategy threshold for p
 at each game state (player_score, opponent_score).
 """
 
+import argparse
 import os
 from jinja2 import Template
 
-from multisim import load_results, SCORE_STEPS
+from multisim import load_results, SCORE_STEPS, RESULTS_PATH
 from strategy_learnings import STRATEGY_ANALYSIS
 
 
@@ -24,9 +25,16 @@ def get_color(value):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Render the optimal strategy heatmap")
+    parser.add_argument("--results", default=RESULTS_PATH,
+                        help=f"Results file to render (default: {RESULTS_PATH})")
+    parser.add_argument("--output", default=os.path.join("out", "strategy_heatmap.html"),
+                        help="HTML file to write (default: out/strategy_heatmap.html)")
+    args = parser.parse_args()
+
     # Load results
     try:
-        optimal_strategies, win_probs, params = load_results()
+        optimal_strategies, win_probs, params = load_results(args.results)
     except FileNotFoundError:
         print("No multisim results found. Run multisim.py first.")
         return
@@ -53,17 +61,19 @@ def main():
     html_content = template.render(
         strategies=processed_strategies,
         colors=colors,
-        score_steps=SCORE_STEPS,
+        score_steps=params.get("score_steps", SCORE_STEPS),
         sims_per_strategy=params["sims_per_strategy"],
+        method=params.get("method", "sampled"),
+        win_threshold=params["win_threshold"],
+        variant=params.get("variant"),
         strategy_analysis=STRATEGY_ANALYSIS
     )
 
-    os.makedirs("out", exist_ok=True)
-    output_path = "out/strategy_heatmap.html"
-    with open(output_path, "w", encoding="utf-8") as f:
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
         f.write(html_content)
 
-    print(f"Analysis complete. Heatmap saved to {output_path}")
+    print(f"Analysis complete. Heatmap saved to {args.output}")
 
 
 if __name__ == "__main__":
@@ -1,44 +1,49 @@
+import argparse
+import json
 import os
-import re
-import statistics
+import numpy as np
 import plotly.graph_objects as go
+import plotly.io as pio
+import exact
+import pmf_cache
+from aggregate import bin_edges, bin_counts
+from analysis import cached, get_available_strategies, load_aggregates, simulation_inputs, DATA_SOURCES
 from jinja2 import Template
-from sim import read_simulations, DATA_DIR
-
-def get_available_strategies():
-    """Finds all X values that have simulation data in the data directory."""
-    strategies = []
-    if not os.path.exists(DATA_DIR):
-        return strategies
-    for filename in os.listdir(DATA_DIR):
-        match = re.match(r"sim_results_(\d+)\.jsonl", filename)
-        if match:
-            strategies.append(int(match.group(1)))
-    return sorted(strategies)
-
-def main():
-    strategies = get_available_strategies()
-    if not strategies:
-        print(f"No simulation data found in {DATA_DIR}/. Run run_sims.sh first.")
-        return
+from sim import DATA_DIR
 
+def build_figures(strategies, use_exact=False):
+    """
+    Returns {"line": ..., "hist": ...} Plotly figure JSON for the strategies,
+    or None if none of them has results.
+    """
     avg_scores = []
     median_scores = []
     all_scores_by_x = {}
     valid_strategies = []
 
     print(f"Processing data for {len(strategies)} strategies...")
+    aggregators = {} if use_exact else load_aggregates(strategies)
     for x in strategies:
-        scores = [res["total_value"] for res in read_simulations(x)]
-        if scores:
+        if use_exact:
+            pmf = pmf_cache.score_pmf(x)
+            scores = np.flatnonzero(pmf)
             valid_strategies.append(x)
-            avg_scores.append(statistics.mean(scores))
-            median_scores.append(statistics.median(scores))
-            all_scores_by_x[x] = scores
+            avg_scores.append(float(np.arange(len(pmf)) @ pmf))
+            median_scores.append(exact.pmf_median(dict(zip(scores.tolist(), pmf[scores].tolist()))))
+            # Histogram weights are probabilities rather than hand counts
+            all_scores_by_x[x] = (scores.tolist(), pmf[scores].tolist())
+            continue
+
+        aggregator = aggregators.get(x)
+        if aggregator:
+            valid_strategies.append(x)
+            avg_scores.append(aggregator.mean())
+            median_scores.append(aggregator.median())
+            # Histogram weights are hand counts from the streaming aggregate
+            all_scores_by_x[x] = aggregator.scores_and_counts()
 
     if not valid_strategies:
-        print("No valid scores found in simulation files.")
-        return
+        return None
 
     # 1. Create Line Graph Figure
     fig_lines = go.Figure()
@@ -52,14 +57,20 @@ def main():
     )
 
     # 2. Create Histogram Figure with Slider
+    # Bin counts are computed here with edges shared by every X, so the page
+    # holds a fixed number of bars per X however many hands were simulated
+    edges = bin_edges(max(max(scores) for scores, _ in all_scores_by_x.values()))
+    width = int(edges[1] - edges[0])
     fig_hist = go.Figure()
     for i, x in enumerate(valid_strategies):
+        scores, weights = all_scores_by_x[x]
         fig_hist.add_trace(
-            go.Histogram(
-                x=all_scores_by_x[x],
+            go.Bar(
+                x=edges[:-1] + (width - 1) / 2,
+                y=bin_counts(scores, weights, edges),
+                width=width,
                 name=f"X={x}",
                 visible=(i == 0),
-                nbinsx=30,
                 marker_color='blue'
             )
         )
@@ -77,18 +88,51 @@ def main():
     fig_hist.update_layout(
         sliders=[dict(active=0, currentvalue={"prefix": "Strategy X: "}, pad={"t": 50}, steps=steps)],
         height=500,
+        bargap=0,
         title=f"Score Distribution (Histogram): X={valid_strategies[0]}",
         xaxis_title="Score Value",
-        yaxis_title="Frequency"
+        yaxis_title="Probability" if use_exact else "Frequency"
+    )
+
+    return {"line": fig_lines.to_json(), "hist": fig_hist.to_json()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze single-hand Flip7 strategies")
+    parser.add_argument(
+        "--exact",
+        action="store_true",
+        help="Use exact distributions (exact.py) for X=1..100 instead of simulation files",
     )
+    args = parser.parse_args()
+
+    if args.exact:
+        strategies = list(range(1, 101))
+    else:
+        strategies = get_available_strategies()
+    if not strategies:
+        print(f"No simulation data found in {DATA_DIR}/. Run run_sims.sh first.")
+        return
+
+    # Figures are cached by the sizes/mtimes of the result files and the code
+    # that builds them, so a template-only change skips straight to rendering
+    if args.exact:
+        figures = cached("analyze_results_exact", lambda: build_figures(strategies, use_exact=True),
+                         sources=[__file__, exact, pmf_cache, *DATA_SOURCES])
+    else:
+        data_files = [path for x in strategies for path in simulation_inputs(x)]
+        figures = cached("analyze_results", lambda: build_figures(strategies),
+                         data_files, [__file__, *DATA_SOURCES])
+    if figures is None:
+        print("No valid scores found in simulation files.")
+        return
 
     # 3. Render with Jinja2
     with open("learnings.html.j2", "r", encoding="utf-8") as f:
         template = Template(f.read())
 
     html_content = template.render(
-        line_graph_div=fig_lines.to_html(full_html=False, include_plotlyjs=False),
-        hist_graph_div=fig_hist.to_html(full_html=False, include_plotlyjs=False)
+        line_graph_div=pio.to_html(json.loads(figures["line"]), full_html=False, include_plotlyjs=False),
+        hist_graph_div=pio.to_html(json.loads(figures["hist"]), full_html=False, include_plotlyjs=False)
     )
 
     os.makedirs("out", exist_ok=True)
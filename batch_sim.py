@@ -0,0 +1,326 @@
+"""
+batch_sim.py - Vectorized NumPy engine that plays many Flip7 hands at once.
+
+Every hand in a batch is one row of a set of parallel arrays: a bitmask of
+the deck positions already drawn, a 13-bit mask of number cards held, the
+running number sum and score, the x2 multiplier, the SC flag and the card
+count.  All hands draw in lock step and hands that stand or bust are
+compacted out, so a batch costs a few dozen array operations per draw
+instead of one trip through run_simulation per hand.
+
+The rules are exactly those of sim.run_simulation, including the quirk that
+SC and modifier cards count towards the seven cards of a Flip 7.
+
+A batch costs one pass per draw, so throughput falls as X rises and hands
+draw more cards (finished hands are already compacted out every step).
+Against the original shuffle-based run_simulation it measured 50-90x
+faster up to X = 50 but only about 40x at X = 90 with cards returned;
+benchmark.py tracks both engines per X range.
+"""
+
+import numpy as np
+
+from cards import deck_cards, encode_card, decode_card, X2_CODE, SC_CODE, MAX_HAND_SIZE, FLIP_SEVEN_BONUS
+from sim import columns_to_records
+
+CHUNK_SIZE = 65536  # Hands per vectorized pass; bounds peak memory
+
+DECK_CODES = np.sort(np.array([encode_card(c) for c in deck_cards()], dtype=np.int8))
+DECK_SIZE = len(DECK_CODES)
+
+# Per-code lookup tables
+CODES = range(SC_CODE + 1)
+IS_NUMBER = np.array([code < 13 for code in CODES])
+IS_MODIFIER = np.array([13 <= code < SC_CODE for code in CODES])  # +N and x2
+NUMBER_BIT = np.array([1 << code if code < 13 else 0 for code in CODES], dtype=np.int16)
+NUMBER_VALUE = np.array([code if code < 13 else 0 for code in CODES], dtype=np.int16)
+MODIFIER_VALUE = np.array(
+    [int(decode_card(code)[1:]) if 13 <= code < X2_CODE else 0 for code in CODES],
+    dtype=np.int16,
+)
+
+_ZERO = np.uint64(0)
+_ONE = np.uint64(1)
+
+
+def _draw(used_lo, used_hi, rng):
+    """
+    Draws one card without replacement for every row.
+
+    The deck is DECK_CODES in sorted order; used_lo/used_hi are per-row
+    bitmasks of the positions already drawn (positions 0-63 and 64+).  A
+    uniformly random position is drawn and redrawn while it is taken, which
+    is an exact draw from the remaining cards.  The masks are updated in
+    place and the drawn card codes are returned.
+    """
+    pos = rng.integers(0, DECK_SIZE, size=len(used_lo))
+    shift = (pos & 63).astype(np.uint64)
+    word = np.where(pos < 64, used_lo, used_hi)
+    todo = np.flatnonzero((word >> shift) & _ONE)
+    while len(todo):
+        candidate = rng.integers(0, DECK_SIZE, size=len(todo))
+        pos[todo] = candidate
+        word = np.where(candidate < 64, used_lo[todo], used_hi[todo])
+        todo = todo[((word >> (candidate & 63).astype(np.uint64)) & _ONE).astype(bool)]
+
+    bit = np.left_shift(_ONE, (pos & 63).astype(np.uint64))
+    low = pos < 64
+    used_lo |= np.where(low, bit, _ZERO)
+    used_hi |= np.where(low, _ZERO, bit)
+    return DECK_CODES[pos]
+
+
+def _remove_slot(cards, slot):
+    """
+    Removes column slot[i] from each row of cards, shifting later cards left.
+    """
+    cols = np.arange(MAX_HAND_SIZE)
+    src = np.minimum(cols + (cols >= slot[:, None]), MAX_HAND_SIZE - 1)
+    shifted = np.take_along_axis(cards, src, axis=1)
+    shifted[:, -1] = -1
+    return shifted
+
+
+def _new_hands(n):
+    """
+    Returns the working set for n fresh hands: one entry per hand still
+    drawing, with rows mapping each entry back to its output row.
+    """
+    return {
+        "rows": np.arange(n),
+        "used_lo": np.zeros(n, dtype=np.uint64),
+        "used_hi": np.zeros(n, dtype=np.uint64),
+        "mask": np.zeros(n, dtype=np.int16),
+        "num_sum": np.zeros(n, dtype=np.int16),
+        "score": np.zeros(n, dtype=np.int16),
+        "mult": np.ones(n, dtype=np.int16),
+        "has_sc": np.zeros(n, dtype=bool),
+        "sc_slot": np.zeros(n, dtype=np.int8),
+        "n_cards": np.zeros(n, dtype=np.int8),
+    }
+
+
+def _select(hands, keep):
+    """
+    Compacts the working set down to the entries where keep is True.
+    """
+    return {key: value[keep] for key, value in hands.items()}
+
+
+def _draw_into(hands, rng, cards):
+    """
+    Draws one card into every hand of the working set, updating it in
+    place.  If cards is given, the kept card is also written into the
+    hand's row of the (n, 7) cards matrix.
+
+    Returns a bool array marking the hands that just busted.
+    """
+    rows, has_sc, n_cards = hands["rows"], hands["has_sc"], hands["n_cards"]
+
+    card = _draw(hands["used_lo"], hands["used_hi"], rng)
+    bit = NUMBER_BIT[card]
+    duplicate = (hands["mask"] & bit) != 0
+    saved = duplicate & has_sc
+    bust = duplicate & ~has_sc
+    new_number = IS_NUMBER[card] & ~duplicate
+    new_sc = (card == SC_CODE) & ~has_sc
+    keep = new_number | bust | new_sc | IS_MODIFIER[card]
+
+    # A saved duplicate discards both itself and the held SC
+    if cards is not None and saved.any():
+        saved_rows = rows[saved]
+        cards[saved_rows] = _remove_slot(cards[saved_rows], hands["sc_slot"][saved])
+    n_cards -= saved
+    if cards is not None:
+        cards[rows[keep], n_cards[keep]] = card[keep]
+    hands["sc_slot"] = np.where(new_sc, n_cards, hands["sc_slot"])
+    n_cards += keep
+    hands["has_sc"] = (has_sc & ~saved) | new_sc
+
+    hands["mask"] |= bit * new_number
+    value = NUMBER_VALUE[card] * new_number
+    hands["num_sum"] += value
+    hands["score"] += value * hands["mult"] + MODIFIER_VALUE[card]
+    is_x2 = card == X2_CODE
+    hands["score"] += hands["num_sum"] * is_x2
+    hands["mult"] += is_x2
+    return bust
+
+
+def _play(strategy_x, n, rng, with_cards):
+    """
+    Plays n hands of STRAT(strategy_x).
+
+    Returns (total_value, is_bust, is_flip_seven_bonus, cards); cards is
+    None unless with_cards is set.
+    """
+    total_value = np.zeros(n, dtype=np.int16)
+    is_bust = np.zeros(n, dtype=bool)
+    is_flip_seven = np.zeros(n, dtype=bool)
+    cards = np.full((n, MAX_HAND_SIZE), -1, dtype=np.int8) if with_cards else None
+
+    hands = _new_hands(n)
+    bust = np.zeros(n, dtype=bool)
+    while len(hands["rows"]):
+        # Stand at seven cards, or at score >= X unless holding a Second Chance
+        n_cards, score = hands["n_cards"], hands["score"]
+        go = ~bust & (n_cards < MAX_HAND_SIZE) & ((score < strategy_x) | hands["has_sc"])
+        if not go.all():
+            done = ~go
+            done_rows = hands["rows"][done]
+            flip_seven = n_cards[done] == MAX_HAND_SIZE
+            total_value[done_rows] = np.where(
+                bust[done], 0, score[done] + FLIP_SEVEN_BONUS * flip_seven
+            )
+            is_bust[done_rows] = bust[done]
+            is_flip_seven[done_rows] = flip_seven & ~bust[done]
+            hands = _select(hands, go)
+
+        bust = _draw_into(hands, rng, cards)
+
+    return total_value, is_bust, is_flip_seven, cards
+
+
+def run_simulations_batch(strategy_x, n, rng=None, with_cards=True):
+    """
+    Runs n simulations of STRAT(strategy_x) as NumPy arrays.
+
+    Returns columnar results:
+        total_value: (n,) int16
+        is_bust: (n,) bool
+        is_flip_seven_bonus: (n,) bool
+        cards: (n, 7) int8 card codes in hand order, padded with -1
+               (omitted when with_cards is False)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    chunks = []
+    for start in range(0, n, CHUNK_SIZE):
+        total_value, is_bust, is_flip_seven, cards = _play(
+            strategy_x, min(CHUNK_SIZE, n - start), rng, with_cards
+        )
+        chunk = {
+            "total_value": total_value,
+            "is_bust": is_bust,
+            "is_flip_seven_bonus": is_flip_seven,
+        }
+        if with_cards:
+            chunk["cards"] = cards
+        chunks.append(chunk)
+
+    if not chunks:
+        chunks.append({
+            "total_value": np.zeros(0, dtype=np.int16),
+            "is_bust": np.zeros(0, dtype=bool),
+            "is_flip_seven_bonus": np.zeros(0, dtype=bool),
+        })
+        if with_cards:
+            chunks[0]["cards"] = np.zeros((0, MAX_HAND_SIZE), dtype=np.int8)
+    if len(chunks) == 1:
+        return chunks[0]
+    return {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+
+
+def _play_all_thresholds(x_values, n, rng, with_cards):
+    """
+    Plays n decks once each and returns the outcome of every STRAT(X) in
+    x_values (sorted ascending) as (len(x_values), n) arrays.
+
+    Scores never decrease during a hand, so STRAT(X) stands at the first
+    decision point without an SC whose score is >= X, and a larger X only
+    extends the draws of a smaller one.  Each hand therefore hits until it
+    busts or holds seven cards, and at every decision point the thresholds
+    it satisfies are settled; whatever is still open at the end shares the
+    final bust or Flip 7 outcome.  Once every threshold is settled the hand
+    stops drawing.
+    """
+    n_x = len(x_values)
+    total_value = np.zeros((n_x, n), dtype=np.int16)
+    is_bust = np.zeros((n_x, n), dtype=bool)
+    is_flip_seven = np.zeros((n_x, n), dtype=bool)
+    cards = np.full((n, MAX_HAND_SIZE), -1, dtype=np.int8) if with_cards else None
+    x_cards = np.full((n_x, n, MAX_HAND_SIZE), -1, dtype=np.int8) if with_cards else None
+    span = np.arange(n_x)
+
+    def settle(rows, lo, hi, value, bust, flip_seven):
+        # Record the current hand as the outcome for thresholds lo..hi-1
+        r, xi = np.nonzero((span >= lo[:, None]) & (span < hi[:, None]))
+        out_rows = rows[r]
+        total_value[xi, out_rows] = value[r]
+        is_bust[xi, out_rows] = bust[r]
+        is_flip_seven[xi, out_rows] = flip_seven[r]
+        if with_cards:
+            x_cards[xi, out_rows] = cards[out_rows]
+
+    hands = _new_hands(n)
+    hands["first_open"] = np.zeros(n, dtype=np.int64)  # Thresholds below are settled
+    bust = np.zeros(n, dtype=bool)
+    while len(hands["rows"]):
+        rows, n_cards, score = hands["rows"], hands["n_cards"], hands["score"]
+        first_open = hands["first_open"]
+        terminal = bust | (n_cards >= MAX_HAND_SIZE)
+
+        # Decision point: without an SC, every open X <= score stands here
+        deciding = ~terminal & ~hands["has_sc"]
+        closed = np.where(deciding, np.searchsorted(x_values, score, side="right"), first_open)
+        closed = np.maximum(closed, first_open)
+        no_flag = np.zeros(len(rows), dtype=bool)
+        settle(rows, first_open, closed, score, no_flag, no_flag)
+
+        # End of the hand: the remaining thresholds all bust or all Flip 7
+        flip_seven = terminal & ~bust
+        end_value = np.where(bust, 0, score + FLIP_SEVEN_BONUS)
+        settle(rows, np.where(terminal, closed, n_x), np.full(len(rows), n_x),
+               end_value, bust, flip_seven)
+
+        hands["first_open"] = closed
+        go = ~terminal & (closed < n_x)
+        if not go.all():
+            hands = _select(hands, go)
+        bust = _draw_into(hands, rng, cards)
+
+    return total_value, is_bust, is_flip_seven, x_cards
+
+
+def run_all_thresholds_batch(x_values, n, rng=None, with_cards=True):
+    """
+    Plays n shuffled decks once each and records the outcome of every
+    STRAT(X) for X in x_values on the same decks (common random numbers).
+
+    Returns columnar results with a leading threshold axis:
+        x_values: (k,) the thresholds, sorted ascending
+        total_value: (k, n) int16
+        is_bust: (k, n) bool
+        is_flip_seven_bonus: (k, n) bool
+        cards: (k, n, 7) int8 (omitted when with_cards is False)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    x_values = np.unique(np.asarray(x_values))
+
+    total_value, is_bust, is_flip_seven, cards = _play_all_thresholds(x_values, n, rng, with_cards)
+    batch = {
+        "x_values": x_values,
+        "total_value": total_value,
+        "is_bust": is_bust,
+        "is_flip_seven_bonus": is_flip_seven,
+    }
+    if with_cards:
+        batch["cards"] = cards
+    return batch
+
+
+def threshold_slice(batch, i):
+    """
+    Returns the run_simulations_batch-style results for the i-th threshold
+    of a run_all_thresholds_batch result.
+    """
+    return {key: value[i] for key, value in batch.items() if key != "x_values"}
+
+
+def batch_to_records(batch):
+    """
+    Converts columnar batch results into run_simulation-style dicts.
+    """
+    return list(columns_to_records(batch))
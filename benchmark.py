@@ -0,0 +1,362 @@
+"""
+benchmark.py - Offline benchmarks of the simulation and analysis hot paths.
+
+    python benchmark.py                          # full run
+    python benchmark.py --quick                  # smaller workloads
+    python benchmark.py --baseline old.json      # flag regressions
+
+Every benchmark runs in a scratch directory (its own data/ and out/), so the
+real results are never touched and nothing is downloaded.  Each measurement
+is the best of --repeat runs.  Results are written as JSON with the machine
+info; against a baseline, any metric that got worse by more than --threshold
+is reported and the exit status is 1.  The same goes for a metric slower
+than the one it replaced (see GUARDS), e.g. store reads against JSONL.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import exact
+import multisim
+import pmf_cache
+from batch_sim import run_simulations_batch
+from sim import (play_hand, calculate_score, read_simulations, save_simulations,
+                 get_legacy_sim_path, DATA_DIR)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.join(DATA_DIR, "benchmarks")
+X_RANGES = [(1, 20), (21, 40), (41, 60), (61, 80), (81, 100)]
+DEFAULT_THRESHOLD = 0.10
+
+# (metric, metric it must be at least as fast as): a replacement path that
+# falls behind the one it replaced is flagged after the report is written
+GUARDS = [
+    ("read.store.records", "read.jsonl.records"),
+]
+
+# Workload sizes (full, --quick)
+SIZES = {
+    "hands_per_x": (2000, 200),
+    "batch_hands_per_x": (50000, 5000),
+    "score_hands": (50000, 5000),
+    "read_rows": (200000, 20000),
+    "multisim_x_values": ([0, 25, 50, 75, 100], [0, 50, 100]),
+    "multisim_sims": (50, 10),
+    "multisim_crn_sims": (2000, 200),
+    "report_x_values": (list(range(1, 101)), list(range(5, 101, 5))),
+    "report_hands": (10000, 1000),
+}
+
+
+def _best_time(func, repeat):
+    """Returns the shortest wall time of repeat calls to func."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silences progress output (tqdm bars and prints) inside benchmarks."""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def _multisim_settings(**settings):
+    """Temporarily overrides multisim's module-level grid parameters."""
+    saved = {name: getattr(multisim, name) for name in settings}
+    for name, value in settings.items():
+        setattr(multisim, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(multisim, name, value)
+
+
+# -----------------------------------------------------------------------------
+# Benchmarks
+# -----------------------------------------------------------------------------
+# Each returns {metric: (value, unit)}.  Units ending in "/s" are rates
+# (higher is better); "s" is elapsed time (lower is better).
+
+
+def bench_hands(size, repeat):
+    """Hands/second of play_hand and of the batch engine over each X range."""
+    metrics = {}
+    for lo, hi in X_RANGES:
+        x_values = range(lo, hi + 1)
+        n = size("hands_per_x")
+
+        def scalar():
+            for x in x_values:
+                for _ in range(n):
+                    play_hand(x)
+
+        elapsed = _best_time(scalar, repeat)
+        metrics[f"hands.scalar.x{lo}-{hi}"] = (n * len(x_values) / elapsed, "hands/s")
+
+        n = size("batch_hands_per_x")
+        rng = np.random.default_rng(0)
+        elapsed = _best_time(lambda: [run_simulations_batch(x, n, rng) for x in x_values], repeat)
+        metrics[f"hands.batch.x{lo}-{hi}"] = (n * len(x_values) / elapsed, "hands/s")
+    return metrics
+
+
+def bench_score(size, repeat):
+    """Calls/second of calculate_score on hands played with STRAT(25)."""
+    hands = []
+    for _ in range(size("score_hands")):
+        hand = play_hand(25)
+        hands.append((hand.cards(), hand.is_bust))
+    elapsed = _best_time(lambda: [calculate_score(cards, is_bust) for cards, is_bust in hands], repeat)
+    return {"calculate_score": (len(hands) / elapsed, "calls/s")}
+
+
+def bench_read(size, repeat):
+    """Rows/second read back from a columnar store and a legacy JSONL file."""
+    n = size("read_rows")
+    save_simulations(run_simulations_batch(25, n, np.random.default_rng(0)), 25)
+    with open(get_legacy_sim_path(26), "w") as f:
+        for record in read_simulations(25):
+            f.write(json.dumps(record) + "\n")
+
+    def read_records(x):
+        for _ in read_simulations(x):
+            pass
+
+    def read_column():
+        read_simulations(25, ["total_value"])["total_value"].sum()
+
+    return {
+        "read.store.records": (n / _best_time(lambda: read_records(25), repeat), "rows/s"),
+        "read.store.columns": (n / _best_time(read_column, repeat), "rows/s"),
+        "read.jsonl.records": (n / _best_time(lambda: read_records(26), repeat), "rows/s"),
+    }
+
+
+def bench_multisim(size, repeat):
+    """
+    States/second of backwards induction: the exact and crn methods on the
+    full grid, and the sampled method with fewer X values and simulations.
+    The exact method's distributions are built (cold) and timed separately,
+    so multisim.exact measures the induction alone.
+    """
+    n_states = len(multisim.SCORE_STEPS) ** 2
+    metrics = {}
+
+    def build_pmfs():
+        exact.clear_memory()
+        pmf_cache.clear_memory()
+        shutil.rmtree(pmf_cache.CACHE_DIR, ignore_errors=True)
+        multisim.build_score_pmfs("exact")
+
+    with _quiet():
+        elapsed = _best_time(build_pmfs, repeat)
+        metrics["multisim.pmf_build"] = (len(multisim.X_VALUES) / elapsed, "distributions/s")
+
+        # The last build left the cache warm
+        elapsed = _best_time(lambda: multisim.compute_optimal_strategies("exact"), repeat)
+        metrics["multisim.exact"] = (n_states / elapsed, "states/s")
+
+        with _multisim_settings(X_VALUES=size("multisim_x_values"), SIMS_PER_STRATEGY=size("multisim_sims")):
+            elapsed = _best_time(lambda: multisim.compute_optimal_strategies("sampled"), repeat)
+            metrics["multisim.sampled"] = (n_states / elapsed, "states/s")
+
+        with _multisim_settings(CRN_SIMS_PER_STRATEGY=size("multisim_crn_sims")):
+            elapsed = _best_time(lambda: multisim.compute_optimal_strategies("crn"), repeat)
+            metrics["multisim.crn"] = (n_states / elapsed, "states/s")
+    return metrics
+
+
+def bench_reports(size, repeat):
+    """End-to-end seconds of analyze_results.py and generate_blog.py."""
+    for x in size("report_x_values"):
+        save_simulations(run_simulations_batch(x, size("report_hands"), np.random.default_rng(x)), x)
+    with _quiet():
+        optimal_strategies, win_probs = multisim.compute_optimal_strategies("exact")
+        multisim.save_results(optimal_strategies, win_probs, method="exact")
+    for template in ("learnings.html.j2", "blog_post.html.j2"):
+        shutil.copy(os.path.join(REPO_DIR, template), template)
+
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+
+    def run(script):
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, script)], env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    metrics = {}
+    for script in ("analyze_results.py", "generate_blog.py"):
+        name = script[:-len(".py")]
+
+        def cold():
+            shutil.rmtree(os.path.join(DATA_DIR, ".analysis_cache"), ignore_errors=True)
+            for x in size("report_x_values"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(DATA_DIR, f"sim_results_{x}", "summary.json"))
+            run(script)
+
+        metrics[f"report.{name}.cold"] = (_best_time(cold, repeat), "s")
+        metrics[f"report.{name}.cached"] = (_best_time(lambda: run(script), repeat), "s")
+    return metrics
+
+
+BENCHMARKS = {
+    "hands": bench_hands,
+    "score": bench_score,
+    "read": bench_read,
+    "multisim": bench_multisim,
+    "reports": bench_reports,
+}
+
+
+# -----------------------------------------------------------------------------
+# Results
+# -----------------------------------------------------------------------------
+
+
+def machine_info():
+    """Returns the platform details recorded with every result file."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "commit": commit,
+    }
+
+
+def run_benchmarks(names, quick=False, repeat=3):
+    """
+    Runs the named benchmarks in a scratch directory and returns the
+    results dict written by main().
+    """
+    def size(name):
+        return SIZES[name][1 if quick else 0]
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine_info(),
+        "quick": quick,
+        "repeat": repeat,
+        "metrics": {},
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="flip7-bench-") as scratch:
+        for name in names:
+            workdir = os.path.join(scratch, name)
+            os.makedirs(os.path.join(workdir, DATA_DIR))
+            os.chdir(workdir)
+            try:
+                print(f"Running {name}...", flush=True)
+                for metric, (value, unit) in BENCHMARKS[name](size, repeat).items():
+                    results["metrics"][metric] = {"value": value, "unit": unit}
+                    print(f"  {metric:<32} {value:>14,.2f} {unit}")
+            finally:
+                os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Returns [(metric, baseline value, value, relative change)] for the
+    metrics present in both that got worse by more than threshold.
+    """
+    regressions = []
+    for metric, entry in results["metrics"].items():
+        old = baseline["metrics"].get(metric)
+        if old is None or not old["value"]:
+            continue
+        change = entry["value"] / old["value"] - 1
+        worse = -change if entry["unit"].endswith("/s") else change
+        if worse > threshold:
+            regressions.append((metric, old["value"], entry["value"], change))
+    return regressions
+
+
+def check_guards(results):
+    """
+    Returns [(metric, value, other metric, other value)] for the GUARDS
+    whose metric came out slower than the one it must keep up with.
+    """
+    failed = []
+    metrics = results["metrics"]
+    for metric, other in GUARDS:
+        if metric in metrics and other in metrics and metrics[metric]["value"] < metrics[other]["value"]:
+            failed.append((metric, metrics[metric]["value"], other, metrics[other]["value"]))
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Flip7 simulation and analysis hot paths")
+    parser.add_argument("--only", type=lambda s: s.split(","), default=list(BENCHMARKS),
+                        help=f"Comma-separated benchmarks to run (default: {','.join(BENCHMARKS)})")
+    parser.add_argument("--quick", action="store_true", help="Use smaller workloads")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best is kept")
+    parser.add_argument("--output", default=None,
+                        help=f"Result file (default: {BENCHMARK_DIR}/benchmark-<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown that counts as a regression (default: 0.10)")
+    args = parser.parse_args()
+    unknown = [name for name in args.only if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output = os.path.abspath(output)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(args.only, args.quick, args.repeat)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    failed = check_guards(results)
+    for metric, value, other, other_value in failed:
+        print(f"Warning: {metric} ({value:,.2f}) is slower than {other} ({other_value:,.2f})")
+
+    regressions = []
+    if baseline is not None:
+        if baseline.get("quick") != results["quick"]:
+            print("Warning: the baseline was run with different workload sizes (--quick)")
+        regressions = compare(results, baseline, args.threshold)
+        if not regressions:
+            print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+        else:
+            print(f"\nRegressions beyond {args.threshold:.0%} against {args.baseline}:")
+            for metric, old, new, change in regressions:
+                unit = results["metrics"][metric]["unit"]
+                print(f"  {metric:<32} {old:>14,.2f} -> {new:,.2f} {unit} ({change:+.1%})")
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+cards.py - The Flip7 deck, its integer card codes and the hand rules'
+constants.
+
+A leaf module (it imports nothing from this repo), so sim.py, store.py and
+the engines can all share these definitions; sim.py re-exports them.
+"""
+
+MAX_HAND_SIZE = 7
+FLIP_SEVEN_BONUS = 15
+
+
+def deck_cards():
+    """
+    Returns the Flip7 deck as an unshuffled list of cards.
+    """
+    deck = []
+
+    # Number cards: denomination n has count n, except 0 has count 1.
+    # 0: 1
+    # 1: 1
+    # 2: 2
+    # ...
+    # 12: 12
+    deck.append(0)
+    for i in range(1, 13):
+        deck.extend([i] * i)
+
+    # Modifier cards
+    # +2, +4, +6, +8, +10 (one of each)
+    deck.extend(["+2", "+4", "+6", "+8", "+10"])
+
+    # Double card: x2 (one)
+    deck.append("x2")
+
+    # Second Chance cards: 3 instances
+    deck.extend(["SC"] * 3)
+
+    return deck
+
+
+# Integer card codes used by the array-based engines.  Number cards keep their
+# denomination (0-12); modifiers, x2 and SC follow in a fixed order.
+MODIFIER_CARDS = ["+2", "+4", "+6", "+8", "+10"]
+CODE_TO_CARD = list(range(13)) + MODIFIER_CARDS + ["x2", "SC"]
+CARD_TO_CODE = {card: code for code, card in enumerate(CODE_TO_CARD)}
+X2_CODE = CARD_TO_CODE["x2"]
+SC_CODE = CARD_TO_CODE["SC"]
+NUM_CARD_CODES = len(CODE_TO_CARD)
+MODIFIER_VALUES = {CARD_TO_CODE[card]: int(card[1:]) for card in MODIFIER_CARDS}
+
+# Number of cards of each code in a full deck
+DECK_COUNTS = tuple(
+    sum(1 for card in deck_cards() if CARD_TO_CODE[card] == code) for code in range(NUM_CARD_CODES)
+)
+
+
+def encode_card(card):
+    """
+    Returns the integer code for a card as it appears in create_deck().
+    """
+    return CARD_TO_CODE[card]
+
+
+def decode_card(code):
+    """
+    Returns the create_deck() card for an integer code.
+    """
+    return CODE_TO_CARD[code]
@@ -0,0 +1,339 @@
+"""
+exact.py - Exact single-hand score distributions for STRAT(X).
+
+A hand keeps at most seven cards drawn from the known deck_cards()
+composition, so the probability of every outcome can be enumerated instead
+of sampled.
+
+The hand state is packed into one integer:
+    bits 0-12   number cards held (a bitmask over denominations 0-12)
+    bits 13-15  duplicates saved by a Second Chance
+    bits 16-18  SC cards drawn so far
+    bit  19     currently holding an SC
+    bit  20     x2 held
+    bits 21+    modifier cards held (a bitmask over the +N cards)
+Together these determine the remaining deck counts.  Which denomination a
+saved duplicate was does not matter: every card matching a held number has
+the same consequence (a save or a bust), so only their total count enters
+the draw probabilities.
+
+The states reachable by drawing are built once into a layered graph (layer
+k = k cards drawn) and memoized per deck composition.  That graph does not
+depend on X; a threshold only decides where probability mass stops, so
+every X is one cheap forward pass over the shared graph.
+"""
+
+import argparse
+
+import numpy as np
+
+from cards import DECK_COUNTS, MAX_HAND_SIZE, FLIP_SEVEN_BONUS, encode_card, decode_card, X2_CODE, SC_CODE
+
+
+# State bit layout
+SAVES_SHIFT = 13
+SC_DRAWN_SHIFT = 16
+HAS_SC_BIT = 1 << 19
+X2_BIT = 1 << 20
+MODS_SHIFT = 21
+FIELD_MASK = 0b111
+
+POPCOUNT = np.array([bin(m).count("1") for m in range(1 << 13)], dtype=np.int64)
+NUMBER_SUM = np.array([sum(d for d in range(13) if m >> d & 1) for m in range(1 << 13)], dtype=np.int64)
+
+_graphs = {}
+_distributions = {}
+
+
+def _bits_table(values, size):
+    """Returns table[m] = sum of values[i] over the set bits i of m."""
+    return np.array(
+        [sum(v for i, v in enumerate(values) if m >> i & 1) for m in range(1 << size)],
+        dtype=np.int64,
+    )
+
+
+def _unpack(keys, rules):
+    """
+    Decodes packed states into the quantities the rules care about:
+    cards in hand, current score, SC held, and the remaining deck size and
+    duplicate-card count.
+    """
+    numbers = keys & 0x1FFF
+    saves = (keys >> SAVES_SHIFT) & FIELD_MASK
+    sc_drawn = (keys >> SC_DRAWN_SHIFT) & FIELD_MASK
+    has_sc = (keys & HAS_SC_BIT) != 0
+    has_x2 = (keys & X2_BIT) != 0
+    mods = keys >> MODS_SHIFT
+
+    n_mods = rules["mod_popcount"][mods]
+    n_cards = POPCOUNT[numbers] + n_mods + has_x2 + has_sc
+    score = NUMBER_SUM[numbers] * (1 + has_x2) + rules["mod_sum"][mods]
+
+    duplicates = rules["held_copies"][numbers] - saves
+    remaining = (
+        rules["number_total"] - rules["held_total"][numbers] + duplicates
+        + rules["sc_count"] - sc_drawn
+        + rules["n_mods"] - n_mods
+        + rules["x2_count"] - has_x2
+    )
+    return {
+        "n_cards": n_cards,
+        "score": score,
+        "has_sc": has_sc,
+        "has_x2": has_x2,
+        "sc_left": rules["sc_count"] - sc_drawn,
+        "duplicates": duplicates,
+        "remaining": remaining,
+    }
+
+
+def _modifier_codes(deck_counts):
+    """Returns the modifier codes in the deck, in state bit order."""
+    return [code for code in range(13, X2_CODE) if deck_counts[code]]
+
+
+def _rules(deck_counts):
+    """
+    Precomputes the per-deck lookup tables used by _unpack and _expand.
+    """
+    number_counts = np.array(deck_counts[:13], dtype=np.int64)
+    mod_codes = _modifier_codes(deck_counts)
+    if any(deck_counts[code] > 1 for code in mod_codes) or deck_counts[X2_CODE] > 1:
+        raise ValueError("exact solver supports at most one copy of each modifier and x2")
+    if deck_counts[SC_CODE] > FIELD_MASK:
+        raise ValueError(f"exact solver supports at most {FIELD_MASK} SC cards")
+
+    mod_values = [int(decode_card(code)[1:]) for code in mod_codes]
+    return {
+        "number_counts": number_counts,
+        "number_total": int(number_counts.sum()),
+        "held_total": _bits_table(number_counts, 13),
+        "held_copies": _bits_table(number_counts - 1, 13),
+        "n_mods": len(mod_codes),
+        "mod_sum": _bits_table(mod_values, len(mod_codes)),
+        "mod_popcount": _bits_table([1] * len(mod_codes), len(mod_codes)),
+        "x2_count": deck_counts[X2_CODE],
+        "sc_count": deck_counts[SC_CODE],
+    }
+
+
+def _expand(keys, state, rules):
+    """
+    Returns (src, child_key, weight, bust_weight) for one draw from every
+    non-terminal state in keys.  The draw probability of an edge is
+    weight / state["remaining"][src].
+    """
+    numbers = keys & 0x1FFF
+    src, children, weights = [], [], []
+
+    def add(valid, child, weight):
+        idx = np.flatnonzero(valid)
+        src.append(idx)
+        children.append(child[idx] if np.ndim(child) else np.full(len(idx), child))
+        weights.append(weight[idx] if np.ndim(weight) else np.full(len(idx), weight))
+
+    for d in range(13):
+        count = rules["number_counts"][d]
+        if count:
+            add((numbers >> d & 1) == 0, keys | (1 << d), count)
+
+    # A card matching a held number is saved by a held SC, otherwise a bust
+    duplicates = state["duplicates"]
+    add((duplicates > 0) & state["has_sc"],
+        (keys + (1 << SAVES_SHIFT)) & ~HAS_SC_BIT, duplicates)
+    bust_weight = np.where(state["has_sc"], 0, duplicates)
+
+    mods = keys >> MODS_SHIFT
+    for i in range(rules["n_mods"]):
+        add((mods >> i & 1) == 0, keys | (1 << (MODS_SHIFT + i)), 1)
+    if rules["x2_count"]:
+        add(~state["has_x2"], keys | X2_BIT, 1)
+
+    # A second SC is discarded; either way one is now held
+    add(state["sc_left"] > 0, (keys + (1 << SC_DRAWN_SHIFT)) | HAS_SC_BIT, state["sc_left"])
+
+    return (np.concatenate(src), np.concatenate(children),
+            np.concatenate(weights).astype(np.float64), bust_weight)
+
+
+def encode_hand(hand, saves=0, discarded_sc=0, deck_counts=DECK_COUNTS):
+    """
+    Returns (layer, key) locating a run_simulation-style hand in
+    state_graph(deck_counts).
+
+    The hand alone does not show Second Chance cards that were used up or
+    discarded, so saves is the number of duplicates an SC has saved and
+    discarded_sc the number of extra SC cards thrown away.
+    """
+    mod_codes = _modifier_codes(deck_counts)
+    key = 0
+    for card in hand:
+        code = encode_card(card)
+        if code < 13:
+            key |= 1 << code
+        elif code == X2_CODE:
+            key |= X2_BIT
+        elif code == SC_CODE:
+            key |= HAS_SC_BIT
+        else:
+            key |= 1 << (MODS_SHIFT + mod_codes.index(code))
+    sc_drawn = (1 if key & HAS_SC_BIT else 0) + saves + discarded_sc
+    key |= (saves << SAVES_SHIFT) | (sc_drawn << SC_DRAWN_SHIFT)
+    # Every draw adds a card, except a saved duplicate (which uses up the
+    # held SC) and a discarded SC
+    layer = len(hand) + 2 * saves + discarded_sc
+    return layer, key
+
+
+def state_graph(deck_counts=DECK_COUNTS):
+    """
+    Returns the layered graph of every hand state reachable from a full
+    deck by drawing (standing is applied later, per X).  Memoized per deck
+    composition.
+
+    Each layer is a dict with the packed "keys", the decoded state fields
+    from _unpack, and the edges to the next layer ("src", "dst", "prob")
+    plus the per-state probability of busting on the next draw ("p_bust").
+    """
+    deck_counts = tuple(deck_counts)
+    graph = _graphs.get(deck_counts)
+    if graph is not None:
+        return graph
+
+    rules = _rules(deck_counts)
+    graph = []
+    keys = np.zeros(1, dtype=np.int64)
+    while len(keys):
+        state = _unpack(keys, rules)
+        layer = dict(state, keys=keys)
+        live = np.flatnonzero(state["n_cards"] < MAX_HAND_SIZE)
+        src, children, weights, bust_weight = _expand(
+            keys[live], {k: v[live] for k, v in state.items()}, rules
+        )
+        inv_remaining = 1.0 / state["remaining"][live]
+        next_keys, dst = np.unique(children, return_inverse=True)
+
+        layer["src"] = live[src].astype(np.int32)
+        layer["dst"] = dst.astype(np.int32)
+        layer["prob"] = weights * inv_remaining[src]
+        p_bust = np.zeros(len(keys))
+        p_bust[live] = bust_weight * inv_remaining
+        layer["p_bust"] = p_bust
+        graph.append(layer)
+        keys = next_keys
+
+    _graphs[deck_counts] = graph
+    return graph
+
+
+def hand_distribution(strategy_x, deck_counts=DECK_COUNTS, flip_seven_bonus=FLIP_SEVEN_BONUS):
+    """
+    Returns the exact outcome distribution of one hand of STRAT(strategy_x):
+        pmf: {total_value: probability}
+        p_bust: probability of busting
+        p_flip_seven: probability of the Flip 7 bonus
+        mean: expected total_value
+    """
+    key = (tuple(deck_counts), flip_seven_bonus, strategy_x)
+    cached = _distributions.get(key)
+    if cached is not None:
+        return cached
+
+    graph = state_graph(deck_counts)
+    size = max(int(layer["score"].max()) for layer in graph) + flip_seven_bonus + 1
+    pmf = np.zeros(size)
+    p_bust = 0.0
+    p_flip_seven = 0.0
+
+    mass = np.ones(1)
+    for layer in graph:
+        flip_seven = layer["n_cards"] >= MAX_HAND_SIZE
+        stand = ~flip_seven & (layer["score"] >= strategy_x) & ~layer["has_sc"]
+        pmf += np.bincount(layer["score"][flip_seven] + flip_seven_bonus,
+                           weights=mass[flip_seven], minlength=size)
+        pmf += np.bincount(layer["score"][stand], weights=mass[stand], minlength=size)
+        p_flip_seven += mass[flip_seven].sum()
+
+        drawing = np.where(flip_seven | stand, 0.0, mass)
+        p_bust += drawing @ layer["p_bust"]
+        if len(layer["dst"]):
+            mass = np.bincount(layer["dst"], weights=drawing[layer["src"]] * layer["prob"])
+    pmf[0] += p_bust
+
+    dist = {
+        "pmf": {int(s): float(pmf[s]) for s in np.flatnonzero(pmf)},
+        "p_bust": float(p_bust),
+        "p_flip_seven": float(p_flip_seven),
+        "mean": float(np.arange(size) @ pmf),
+    }
+    _distributions[key] = dist
+    return dist
+
+
+def score_pmf_array(strategy_x, size=None, **rules):
+    """
+    Returns the total_value PMF of STRAT(strategy_x) as a NumPy array
+    indexed by score.  size defaults to one past the largest score.
+    """
+    pmf = hand_distribution(strategy_x, **rules)["pmf"]
+    if size is None:
+        size = max(pmf) + 1
+    arr = np.zeros(size)
+    for score, p in pmf.items():
+        arr[score] += p
+    return arr
+
+
+def clear_memory():
+    """Forgets the cached state graphs and distributions."""
+    _graphs.clear()
+    _distributions.clear()
+
+
+def pmf_quantile(pmf, q):
+    """
+    Returns the smallest score whose cumulative probability reaches q.
+    """
+    cumulative = 0.0
+    for score, p in sorted(pmf.items()):
+        cumulative += p
+        if cumulative >= q - 1e-12:
+            return score
+    return max(pmf)
+
+
+def pmf_median(pmf):
+    """
+    Returns the median of a score PMF, averaging the two middle scores when
+    the cumulative probability lands exactly on one half.
+    """
+    cumulative = 0.0
+    scores = sorted(pmf)
+    for i, score in enumerate(scores):
+        cumulative += pmf[score]
+        if abs(cumulative - 0.5) < 1e-12 and i + 1 < len(scores):
+            return (score + scores[i + 1]) / 2
+        if cumulative > 0.5:
+            return score
+    return scores[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact Flip7 single-hand distributions")
+    parser.add_argument("--x", type=int, nargs="+", default=list(range(0, 101, 5)),
+                        help="Strategy thresholds to solve")
+    args = parser.parse_args()
+
+    print(f"{'X':>4} {'mean':>8} {'median':>7} {'P(bust)':>8} {'P(Flip 7)':>10}")
+    for x in args.x:
+        dist = hand_distribution(x)
+        print(f"{x:>4} {dist['mean']:>8.3f} {pmf_median(dist['pmf']):>7} "
+              f"{dist['p_bust']:>8.2%} {dist['p_flip_seven']:>10.2%}")
+
+    n_states = sum(len(layer["keys"]) for layer in state_graph())
+    print(f"\nHand states: {n_states}")
+
+
+if __name__ == "__main__":
+    main()
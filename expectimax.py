@@ -0,0 +1,123 @@
+"""
+expectimax.py - The exact optimal single-hand policy, beyond STRAT(X).
+
+STRAT(X) decides from the current score alone.  The optimal decision to hit
+or stand depends on the whole hand state: which numbers are held, SC, x2,
+modifiers, card count and therefore the remaining deck.  This module solves
+that decision by expectimax over every reachable hand state.
+
+The states are the packed integers of exact.py, whose layered state_graph
+already merges transpositions (the same hand reached in a different draw
+order).  One backward pass over its layers gives, for every state,
+
+    value = max(stand value, hit value)
+    stand value = current score
+    hit value = sum over draws of P(draw) * value(next state)   (bust = 0)
+
+with a hand of seven cards ending in the Flip 7 bonus.  Solutions are
+memoized per deck composition and bonus.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from exact import (DECK_COUNTS, FLIP_SEVEN_BONUS, MAX_HAND_SIZE,
+                   encode_hand, hand_distribution, state_graph)
+
+_policies = {}
+
+
+def optimal_policy(deck_counts=DECK_COUNTS, flip_seven_bonus=FLIP_SEVEN_BONUS):
+    """
+    Returns the solved state graph: one dict per layer of
+    exact.state_graph(deck_counts) with
+        keys: packed hand states (sorted)
+        value: expected final score under optimal play
+        hit_value: expected final score of hitting once, then playing optimally
+        hit: True where hitting is optimal
+    """
+    memo_key = (tuple(deck_counts), flip_seven_bonus)
+    policy = _policies.get(memo_key)
+    if policy is not None:
+        return policy
+
+    graph = state_graph(deck_counts)
+    policy = [None] * len(graph)
+    next_value = np.zeros(0)
+    for k in range(len(graph) - 1, -1, -1):
+        layer = graph[k]
+        full = layer["n_cards"] >= MAX_HAND_SIZE
+        score = layer["score"].astype(np.float64)
+        hit_value = np.zeros(len(layer["keys"]))
+        if len(layer["dst"]):
+            hit_value = np.bincount(layer["src"], weights=layer["prob"] * next_value[layer["dst"]],
+                                    minlength=len(layer["keys"]))
+        hit = ~full & (hit_value > score)
+        value = np.where(full, score + flip_seven_bonus, np.maximum(score, hit_value))
+        policy[k] = {"keys": layer["keys"], "value": value, "hit_value": hit_value, "hit": hit}
+        next_value = value
+
+    _policies[memo_key] = policy
+    return policy
+
+
+def _lookup(hand, saves, discarded_sc, deck_counts, flip_seven_bonus):
+    policy = optimal_policy(deck_counts, flip_seven_bonus)
+    k, key = encode_hand(hand, saves, discarded_sc, deck_counts)
+    if k < len(policy):
+        layer = policy[k]
+        i = int(np.searchsorted(layer["keys"], key))
+        if i < len(layer["keys"]) and layer["keys"][i] == key:
+            return layer, i
+    raise ValueError(f"unreachable hand state: {hand} (saves={saves}, discarded_sc={discarded_sc})")
+
+
+def best_action(hand, saves=0, discarded_sc=0, deck_counts=DECK_COUNTS,
+                flip_seven_bonus=FLIP_SEVEN_BONUS):
+    """
+    Returns "hit" or "stand" for a hand as run_simulation builds it (e.g.
+    [5, "+4", "SC"]).  saves and discarded_sc account for SC cards no longer
+    in the hand (see exact.encode_hand).
+    """
+    layer, i = _lookup(hand, saves, discarded_sc, deck_counts, flip_seven_bonus)
+    return "hit" if layer["hit"][i] else "stand"
+
+
+def expected_value(hand=(), saves=0, discarded_sc=0, deck_counts=DECK_COUNTS,
+                   flip_seven_bonus=FLIP_SEVEN_BONUS):
+    """
+    Returns the expected final score of a hand under optimal play (from an
+    empty hand by default).
+    """
+    layer, i = _lookup(list(hand), saves, discarded_sc, deck_counts, flip_seven_bonus)
+    return float(layer["value"][i])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact optimal Flip7 single-hand policy")
+    parser.add_argument("--max-x", type=int, default=100, help="Largest STRAT(X) to compare against")
+    args = parser.parse_args()
+
+    start = time.time()
+    policy = optimal_policy()
+    elapsed = time.time() - start
+    n_states = sum(len(layer["keys"]) for layer in policy)
+    n_hit = sum(int(layer["hit"].sum()) for layer in policy)
+    print(f"Solved {n_states} hand states in {elapsed:.1f}s ({n_hit} hit, {n_states - n_hit} stand)")
+
+    means = {x: hand_distribution(x)["mean"] for x in range(args.max_x + 1)}
+    best_x = max(means, key=means.get)
+    optimal = expected_value()
+    print(f"Optimal policy expected score: {optimal:.4f}")
+    print(f"Best STRAT(X): X={best_x}, expected score {means[best_x]:.4f}")
+    print(f"Gain from the full hand state: {optimal - means[best_x]:+.4f} ({optimal / means[best_x] - 1:+.2%})")
+
+    print("\nExamples:")
+    for hand in ([], [12, 11, 10], [12, 11, 10, "SC"], [1, 2, 3, 4, 5], [2, 3, "+10", "x2"]):
+        print(f"  {str(hand):>24}: {best_action(hand):>5}, expected score {expected_value(hand):.2f}")
+
+
+if __name__ == "__main__":
+    main()
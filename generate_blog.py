@@ -5,27 +5,18 @@ Combines data from single-hand simulations and game-theoretic analysis
 into a comprehensive blog post with interactive visualizations.
 """
 
+import json
 import os
-import re
-import statistics
 
 import plotly.graph_objects as go
+import plotly.io as pio
 from jinja2 import Template
 
-from sim import read_simulations, DATA_DIR
-from multisim import load_results, SCORE_STEPS
-
-
-def get_available_strategies():
-    """Finds all X values that have simulation data in the data directory."""
-    strategies = []
-    if not os.path.exists(DATA_DIR):
-        return strategies
-    for filename in os.listdir(DATA_DIR):
-        match = re.match(r"sim_results_(\d+)\.jsonl", filename)
-        if match:
-            strategies.append(int(match.group(1)))
-    return sorted(strategies)
+from aggregate import bin_edges, bin_counts
+from analysis import cached, get_available_strategies, load_aggregates, simulation_inputs, DATA_SOURCES
+import multisim
+from sim import DATA_DIR
+from multisim import load_results, RESULTS_PATH, SCORE_STEPS
 
 
 def get_color(value):
@@ -39,30 +30,28 @@ def get_color(value):
     return f"rgb({r}, {g}, {b})"
 
 
-def main():
-    # Load single-hand simulation data
-    strategies = get_available_strategies()
-    if not strategies:
-        print(f"No simulation data found in {DATA_DIR}/. Run run_sims.sh first.")
-        return
-
+def build_page_data(strategies):
+    """
+    Returns the blog's figure JSON and optimal strategy grid (as
+    [p1_score, p2_score, X or None] rows), or None if no strategy has results.
+    """
     avg_scores = []
     median_scores = []
     all_scores_by_x = {}
     valid_strategies = []
 
     print(f"Loading single-hand simulation data for {len(strategies)} strategies...")
+    aggregators = load_aggregates(strategies)
     for x in strategies:
-        scores = [res["total_value"] for res in read_simulations(x)]
-        if scores:
+        aggregator = aggregators.get(x)
+        if aggregator:
             valid_strategies.append(x)
-            avg_scores.append(statistics.mean(scores))
-            median_scores.append(statistics.median(scores))
-            all_scores_by_x[x] = scores
+            avg_scores.append(aggregator.mean())
+            median_scores.append(aggregator.median())
+            all_scores_by_x[x] = aggregator.scores_and_counts()
 
     if not valid_strategies:
-        print("No valid scores found in simulation files.")
-        return
+        return None
 
     # Create Line Graph
     print("Creating line graph...")
@@ -97,14 +86,20 @@ def main():
 
     # Create Histogram with Slider
     print("Creating histogram with slider...")
+    # Bin counts are computed here with edges shared by every X, so the page
+    # holds a fixed number of bars per X however many hands were simulated
+    edges = bin_edges(max(max(scores) for scores, _ in all_scores_by_x.values()))
+    width = int(edges[1] - edges[0])
     fig_hist = go.Figure()
     for i, x in enumerate(valid_strategies):
+        scores, counts = all_scores_by_x[x]
         fig_hist.add_trace(
-            go.Histogram(
-                x=all_scores_by_x[x],
+            go.Bar(
+                x=edges[:-1] + (width - 1) / 2,
+                y=bin_counts(scores, counts, edges),
+                width=width,
                 name=f"X={x}",
                 visible=(i == 0),
-                nbinsx=30,
                 marker_color='#3498db'
             )
         )
@@ -127,6 +122,7 @@ def main():
             steps=steps
         )],
         height=500,
+        bargap=0,
         title=f"Score Distribution: Threshold X = {valid_strategies[0]}",
         xaxis_title="Score",
         yaxis_title="Frequency",
@@ -139,19 +135,35 @@ def main():
 
     # Load game-theoretic analysis data
     print("Loading game-theoretic analysis data...")
-    try:
-        optimal_strategies, win_probs, params = load_results()
-    except FileNotFoundError:
+    optimal_strategies, win_probs, params = load_results()
+
+    # Process strategies - mark hopeless situations as N/A
+    strategy_rows = []
+    for (p1, p2), strategy in optimal_strategies.items():
+        strategy_rows.append([p1, p2, None if strategy == 0 else strategy])
+
+    return {"line": fig_lines.to_json(), "hist": fig_hist.to_json(), "strategies": strategy_rows}
+
+
+def main():
+    # Load single-hand simulation data
+    strategies = get_available_strategies()
+    if not strategies:
+        print(f"No simulation data found in {DATA_DIR}/. Run run_sims.sh first.")
+        return
+    if not os.path.exists(RESULTS_PATH):
         print("No multisim results found. Run multisim.py first.")
         return
 
-    # Process strategies - mark hopeless situations as N/A
-    processed_strategies = {}
-    for key, strategy in optimal_strategies.items():
-        if strategy == 0:
-            processed_strategies[key] = None  # N/A
-        else:
-            processed_strategies[key] = strategy
+    # Cached by the sizes/mtimes of the result files (simulations and
+    # multisim) and the code that builds the page data, so a template-only
+    # change skips straight to rendering
+    data_files = [path for x in strategies for path in simulation_inputs(x)] + [RESULTS_PATH]
+    page = cached("blog_post", lambda: build_page_data(strategies), data_files, [__file__, multisim, *DATA_SOURCES])
+    if page is None:
+        print("No valid scores found in simulation files.")
+        return
+    processed_strategies = {(p1, p2): strategy for p1, p2, strategy in page["strategies"]}
 
     # Generate color map
     colors = {x: get_color(x) for x in range(0, 101)}
@@ -163,8 +175,8 @@ def main():
         template = Template(f.read())
 
     html_content = template.render(
-        line_graph_div=fig_lines.to_html(full_html=False, include_plotlyjs=False),
-        hist_graph_div=fig_hist.to_html(full_html=False, include_plotlyjs=False),
+        line_graph_div=pio.to_html(json.loads(page["line"]), full_html=False, include_plotlyjs=False),
+        hist_graph_div=pio.to_html(json.loads(page["hist"]), full_html=False, include_plotlyjs=False),
         strategies=processed_strategies,
         colors=colors,
         score_steps=SCORE_STEPS
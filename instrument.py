@@ -0,0 +1,174 @@
+"""
+instrument.py - Opt-in counters, phase timers and throughput samples.
+
+Instrumentation is off unless session() (or enable()) turns it on.  Hot
+loops read the module-level `enabled` flag once per hand or task and only
+take timestamps when it is set, so the disabled cost is one global lookup.
+
+A run's report holds
+    counters: event counts, e.g. hands and states
+    timers:   seconds spent in each phase (deck, hand, score, lookup, expectation, io...)
+    gauges:   hands/sec and states/sec over the whole run
+    samples:  cumulative counts at checkpoints during the run, with the
+              throughput of each interval, to show drift
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import time
+from collections import defaultdict
+
+enabled = False
+counters = defaultdict(int)
+timers = defaultdict(float)
+samples = []
+_start = None
+_stop = None
+
+# Counters reported as per-second gauges
+GAUGES = ("hands", "states")
+
+
+def enable():
+    """Turns instrumentation on and starts a fresh run."""
+    global enabled, _start, _stop
+    reset()
+    enabled = True
+    _start = time.perf_counter()
+    _stop = None
+
+
+def disable():
+    global enabled, _stop
+    enabled = False
+    _stop = time.perf_counter()
+
+
+def elapsed():
+    """Seconds since enable(), up to disable() if it has been called."""
+    return (_stop or time.perf_counter()) - _start
+
+
+def reset():
+    counters.clear()
+    timers.clear()
+    samples.clear()
+
+
+def count(name, n=1):
+    counters[name] += n
+
+
+def add_time(name, seconds):
+    timers[name] += seconds
+
+
+@contextlib.contextmanager
+def timer(name):
+    """Adds the time spent in the with block to timers[name]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timers[name] += time.perf_counter() - start
+
+
+_UNTIMED = contextlib.nullcontext()
+
+
+def phase(name):
+    """
+    timer(name) when instrumentation is on, else a shared no-op context.
+    For coarse phases (per task or batch) outside the per-hand loops.
+    """
+    return timer(name) if enabled else _UNTIMED
+
+
+def snapshot():
+    """Returns the counters and timers, e.g. to send back from a worker."""
+    return {"counters": dict(counters), "timers": dict(timers)}
+
+
+def merge(other):
+    """
+    Adds a snapshot() from another process.  Timers then sum over
+    processes, so with a pool they can add up to more than the wall time.
+    """
+    for name, n in other["counters"].items():
+        counters[name] += n
+    for name, seconds in other["timers"].items():
+        timers[name] += seconds
+
+
+def sample():
+    """Records the current counters against the elapsed time."""
+    samples.append({"elapsed": elapsed(), **{name: counters.get(name, 0) for name in GAUGES}})
+
+
+def report(**metadata):
+    """Returns the run report (see the module docstring) as a dict."""
+    total = elapsed()
+    intervals = []
+    previous = {"elapsed": 0.0, **{name: 0 for name in GAUGES}}
+    for point in samples:
+        seconds = point["elapsed"] - previous["elapsed"]
+        interval = dict(point)
+        for name in GAUGES:
+            interval[f"{name}_per_sec"] = (point[name] - previous[name]) / seconds if seconds > 0 else None
+        intervals.append(interval)
+        previous = point
+    return {
+        **metadata,
+        "elapsed": total,
+        "counters": dict(counters),
+        "timers": dict(sorted(timers.items(), key=lambda item: -item[1])),
+        "gauges": {f"{name}_per_sec": counters[name] / total for name in GAUGES if counters.get(name)},
+        "samples": intervals,
+    }
+
+
+@contextlib.contextmanager
+def session(report_path=None, profile_path=None, **metadata):
+    """
+    Instruments the with block and writes its report (with metadata) as JSON
+    to report_path.  With profile_path, the block also runs under cProfile
+    and the stats are dumped there (for pstats or snakeviz).  Does nothing
+    if both are None.
+    """
+    if report_path is None and profile_path is None:
+        yield
+        return
+
+    enable()
+    profiler = cProfile.Profile() if profile_path else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            os.makedirs(os.path.dirname(profile_path) or ".", exist_ok=True)
+            profiler.dump_stats(profile_path)
+            print(f"Profile saved to {profile_path}")
+        disable()
+
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+        with open(report_path, "w") as f:
+            json.dump(report(**metadata), f, indent=2)
+        print(f"Instrumentation report saved to {report_path}")
+        print_summary()
+
+
+def print_summary():
+    """Prints the phase timers and gauges of the current run."""
+    total = elapsed()
+    print(f"\nPhase timings ({total:.1f}s total):")
+    for name, seconds in sorted(timers.items(), key=lambda item: -item[1]):
+        print(f"  {name:<12} {seconds:>9.2f}s  {seconds / total:>6.1%}")
+    for name in GAUGES:
+        if counters.get(name):
+            print(f"  {name}/sec: {counters[name] / total:,.0f}")
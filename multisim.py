@@ -2,21 +2,51 @@
 multisim.py - Backwards induction to find optimal Flip7 strategies for two-player game.
 
 For each game state (player_score, opponent_score) rounded to nearest 10s,
-determines the best STRAT(X) for player 1 using simulation.
+determines the best STRAT(X) for player 1.
+
+A hand's score distribution under STRAT(X) does not depend on the game
+state, so by default each X's score PMF is built once (exactly, via
+exact.py and cached by pmf_cache.py, or from the stored simulation
+results) and every win rate is an exact expectation over the joint P1/P2
+score grid.  The original per-state
+resampling is still available as --method sampled.
 """
 
+import argparse
 import json
+import multiprocessing
 import os
+import random
+import time
 from collections import defaultdict
+import numpy as np
 from tqdm import tqdm
 
-from sim import run_simulation, DATA_DIR
+import instrument
+from sim import play_hand, play_hand_timed, load_aggregate, DATA_DIR
+from pmf_cache import score_pmf
+from batch_sim import run_simulations_batch, run_all_thresholds_batch
 
 # Strategy parameters
 X_VALUES = list(range(0, 101, 5))  # 0, 5, 10, ..., 100
 SCORE_STEPS = list(range(0, 200, 10))  # 0, 10, 20, ..., 190
 SIMS_PER_STRATEGY = 10000
 WIN_THRESHOLD = 200
+METHODS = ("exact", "data", "sampled", "racing", "crn")
+DEFAULT_P2_X = 25  # P2's strategy until the mirrored state is solved (~optimal single hand)
+
+# Adaptive racing (--method racing)
+RACING_ROUND_SIZE = 500
+RACING_Z = 3.0
+RACING_TOLERANCE = 1e-3
+
+# Variance-reduced sampling (--method crn)
+CRN_SIMS_PER_STRATEGY = 2000
+CI_Z = 1.96  # 95% confidence intervals
+RESULTS_PATH = os.path.join(DATA_DIR, "multisim_results.json")
+CHECKPOINT_PATH = os.path.join(DATA_DIR, "multisim_checkpoint.json")
+INSTRUMENTATION_PATH = os.path.join(DATA_DIR, "multisim_instrumentation.json")
+PROFILE_PATH = os.path.join(DATA_DIR, "multisim_profile.prof")
 
 
 def round_to_10(score):
@@ -26,18 +56,25 @@ def round_to_10(score):
 
 def simulate_hand(strategy_x):
     """Run a single hand simulation and return the score."""
-    result = run_simulation(strategy_x)
-    return result["total_value"]
+    if instrument.enabled:
+        hand = play_hand_timed(strategy_x)
+        with instrument.timer("score"):
+            return hand.score()
+    return play_hand(strategy_x).score()
 
 
-def evaluate_strategy(p1_score, p2_score, p1_x, p2_x, win_probs, optimal_strategies, n_sims):
+def evaluate_strategy(p1_score, p2_score, p1_x, p2_x, win_probs, optimal_strategies, n_sims,
+                      with_se=False):
     """
     Evaluate player 1's win rate when starting at (p1_score, p2_score)
     with P1 using STRAT(p1_x) and P2 using STRAT(p2_x).
 
     Uses precomputed win_probs for states we haven't reached terminal yet.
+    With with_se, returns (win rate, its standard error).
     """
     wins = 0
+    wins_sq = 0
+    timed = instrument.enabled
 
     for _ in range(n_sims):
         # Both players play a hand
@@ -54,83 +91,551 @@ def evaluate_strategy(p1_score, p2_score, p1_x, p2_x, win_probs, optimal_strateg
         if p1_won and p2_won:
             # Both crossed - higher score wins
             if new_p1 > new_p2:
-                wins += 1
+                value = 1
             elif new_p1 == new_p2:
-                wins += 0.5  # Tie counts as half win
-            # else: P2 wins
+                value = 0.5  # Tie counts as half win
+            else:
+                value = 0  # P2 wins
         elif p1_won:
-            wins += 1
+            value = 1
         elif p2_won:
-            pass  # P2 wins
+            value = 0  # P2 wins
         else:
             # Neither won - look up win probability from new state
+            if timed:
+                start = time.perf_counter()
             new_p1_rounded = round_to_10(new_p1)
             new_p2_rounded = round_to_10(new_p2)
-            wins += win_probs.get((new_p1_rounded, new_p2_rounded), 0.5)
+            value = win_probs.get((new_p1_rounded, new_p2_rounded), 0.5)
+            if timed:
+                instrument.add_time("lookup", time.perf_counter() - start)
+        wins += value
+        wins_sq += value * value
 
-    return wins / n_sims
+    win_rate = wins / n_sims
+    if not with_se:
+        return win_rate
+    variance = max(wins_sq - n_sims * win_rate * win_rate, 0.0) / max(n_sims - 1, 1)
+    return win_rate, (variance / n_sims) ** 0.5
 
 
-def compute_optimal_strategies():
+def build_score_pmfs(method):
     """
-    Use backwards induction to compute optimal strategies for all states.
+    Returns {X: score PMF array indexed by hand score} for every X in
+    X_VALUES.  "exact" solves the distributions exactly (served from
+    pmf_cache after the first run); "data" normalizes the stored simulation
+    results of each X (see sim.load_aggregate).
+    """
+    pmfs = {}
+    for x in X_VALUES:
+        if method == "exact":
+            pmfs[x] = score_pmf(x)
+        else:
+            aggregator = load_aggregate(x)
+            if aggregator is None:
+                raise FileNotFoundError(f"No simulation data for X={x}. Run run_sims.sh first.")
+            pmfs[x] = aggregator.pmf()
+    return pmfs
 
-    Returns:
-        optimal_strategies: dict mapping (p1_score, p2_score) -> best X for P1
-        win_probs: dict mapping (p1_score, p2_score) -> P1 win probability
+
+def continuation_table(win_probs):
     """
-    optimal_strategies = {}
-    win_probs = {}
+    Returns win_probs as a dense array indexed by (p1_score // 10,
+    p2_score // 10), with unsolved states at the 0.5 default.
+    """
+    table = np.full((len(SCORE_STEPS), len(SCORE_STEPS)), 0.5)
+    for (p1, p2), p in win_probs.items():
+        table[p1 // 10, p2 // 10] = p
+    return table
 
-    # Generate all states, sorted by sum of scores (descending) for backwards induction
-    all_states = [(p1, p2) for p1 in SCORE_STEPS for p2 in SCORE_STEPS]
-    all_states.sort(key=lambda s: s[0] + s[1], reverse=True)
 
-    print(f"Computing optimal strategies for {len(all_states)} states...")
-    print(f"Testing {len(X_VALUES)} strategy values with {SIMS_PER_STRATEGY} simulations each")
+def evaluate_strategy_exact(p1_score, p2_score, p1_pmf, p2_pmf, table):
+    """
+    Exact version of evaluate_strategy: player 1's expected win rate from
+    (p1_score, p2_score) when the hand scores follow p1_pmf and p2_pmf.
 
-    for p1_score, p2_score in tqdm(all_states, desc="Backwards induction"):
-        best_x = 0
-        best_win_rate = -1
+    table is the continuation_table of the current win_probs.  The terminal
+    rules and round_to_10 semantics are those of evaluate_strategy.
+    """
+    s1 = np.flatnonzero(p1_pmf)
+    s2 = np.flatnonzero(p2_pmf)
+    with instrument.phase("lookup"):
+        value = outcome_values((p1_score + s1)[:, None], (p2_score + s2)[None, :], table)
+    with instrument.phase("expectation"):
+        return float(p1_pmf[s1] @ value @ p2_pmf[s2])
 
-        # For each possible P1 strategy, find best response
-        for p1_x in X_VALUES:
-            # P2 uses their optimal strategy for the symmetric position
-            # (opponent's perspective: their score is p2_score, opponent has p1_score)
-            p2_x = optimal_strategies.get((p2_score, p1_score), 25)  # Default to ~optimal single-hand
 
-            win_rate = evaluate_strategy(
-                p1_score, p2_score, p1_x, p2_x,
-                win_probs, optimal_strategies, SIMS_PER_STRATEGY
-            )
+def outcome_values(new_p1, new_p2, table):
+    """
+    Vectorized outcome of evaluate_strategy for broadcastable arrays of
+    post-hand scores: 1 / 0.5 / 0 for terminal states, else the
+    continuation_table value of the rounded new state.
+    """
+    p1_won = new_p1 >= WIN_THRESHOLD
+    p2_won = new_p2 >= WIN_THRESHOLD
+    both_value = np.where(new_p1 > new_p2, 1.0, np.where(new_p1 == new_p2, 0.5, 0.0))
+    # Only index the table where neither player won; clip keeps it in range
+    row = np.minimum(new_p1, WIN_THRESHOLD - 1) // 10
+    col = np.minimum(new_p2, WIN_THRESHOLD - 1) // 10
+    return np.where(
+        p1_won & p2_won, both_value,
+        np.where(p1_won, 1.0, np.where(p2_won, 0.0, table[row, col]))
+    )
+
+
+def race_strategies(p1_score, p2_score, p2_x, table, rng, max_sims=None, round_size=None, z=None):
+    """
+    Adaptive alternative to evaluating every X with max_sims simulations
+    (default SIMS_PER_STRATEGY; round_size and z default to RACING_ROUND_SIZE
+    and RACING_Z, read at call time so overrides of them apply).
+
+    All surviving candidates are simulated in rounds of round_size hands
+    (P1's hands from batch_sim, scored against one shared batch of P2 hands
+    per round).  After each round, a candidate whose upper confidence bound
+    (mean + z standard errors) is below the best lower bound is dropped.
+    The race ends when one candidate is left, every survivor reached
+    max_sims, or all survivors are within RACING_TOLERANCE of each other.
+
+    Returns (best_x, win_rate, sims_used, margin), where sims_used counts
+    P1 hands (as the non-racing budget does; each round also plays n P2
+    hands) and margin is the chosen X's lower bound minus the highest upper
+    bound of any other candidate (positive when the choice is statistically
+    separated).
+    """
+    max_sims = SIMS_PER_STRATEGY if max_sims is None else max_sims
+    round_size = RACING_ROUND_SIZE if round_size is None else round_size
+    z = RACING_Z if z is None else z
+    k = len(X_VALUES)
+    sums = np.zeros(k)
+    sums_sq = np.zeros(k)
+    counts = np.zeros(k, dtype=np.int64)
+    alive = np.ones(k, dtype=bool)
+
+    while True:
+        n = min(round_size, max_sims - counts[alive][0])
+        with instrument.phase("hand"):
+            p2_hands = run_simulations_batch(p2_x, n, rng, with_cards=False)["total_value"]
+        for i in np.flatnonzero(alive):
+            with instrument.phase("hand"):
+                p1_hands = run_simulations_batch(X_VALUES[i], n, rng, with_cards=False)["total_value"]
+            with instrument.phase("lookup"):
+                values = outcome_values(p1_score + p1_hands.astype(np.int64),
+                                        p2_score + p2_hands.astype(np.int64), table)
+            sums[i] += values.sum()
+            sums_sq[i] += values @ values
+            counts[i] += n
+        if instrument.enabled:
+            instrument.count("hands", n * (1 + int(alive.sum())))
+
+        seen = counts > 0
+        mean = np.where(seen, sums / np.maximum(counts, 1), 0.0)
+        var = np.maximum(sums_sq / np.maximum(counts, 1) - mean * mean, 0.0)
+        half_width = z * np.sqrt(var / np.maximum(counts, 1))
+        lower, upper = mean - half_width, mean + half_width
+
+        alive &= upper >= lower[alive].max()
+        if (alive.sum() == 1 or counts[alive][0] >= max_sims
+                or upper[alive].max() - lower[alive].min() < RACING_TOLERANCE):
+            break
+
+    # First X with the highest mean among the survivors, as in the serial search
+    best = int(np.flatnonzero(alive)[np.argmax(mean[alive])])
+    others = np.arange(k) != best
+    margin = float(lower[best] - upper[others].max()) if others.any() else 0.0
+    return X_VALUES[best], float(mean[best]), int(counts.sum()), margin
+
+
+def evaluate_strategies_crn(p1_score, p2_score, p2_x, table, means, rng,
+                            n_sims=CRN_SIMS_PER_STRATEGY, antithetic=True, control_variate=True):
+    """
+    Variance-reduced alternative to calling evaluate_strategy for each X:
+    estimates P1's win rate for every X in X_VALUES at once.
+
+    Common random numbers: one batch_sim.run_all_thresholds_batch run plays
+    2 * n_sims decks for every X (and p2_x).  Every candidate plays the same
+    n_sims P1 decks against the same P2 hands, so the differences between
+    candidates, which decide the argmax, are far less noisy than with
+    independent samples.
+
+    Antithetic pairs: each pair of decks is also played with the players
+    swapped.  The swapped game has the same distribution, and a deck that
+    is good for one player is then good for the other, so the two outcomes
+    are negatively correlated.  No extra hands are played.
+
+    Control variate: the deviations of P1's and P2's hand scores from their
+    exact means (means, {X: mean score}) are regressed out of the outcome,
+    per candidate.
+
+    Returns (win_rates, units): win_rates is (k,) and units is (k, n_sims),
+    the per-deck-pair values whose means are win_rates, from which the
+    standard error of any candidate or difference follows.
+    """
+    x_values = np.array(sorted(set(X_VALUES) | {p2_x}))
+    with instrument.phase("hand"):
+        scores = run_all_thresholds_batch(x_values, 2 * n_sims, rng, with_cards=False)["total_value"]
+    if instrument.enabled:
+        instrument.count("hands", 2 * n_sims * len(x_values))
+    scores = scores.astype(np.int64)
+    p1_rows = np.searchsorted(x_values, X_VALUES)
+    p2_row = int(np.searchsorted(x_values, p2_x))
+    first, second = scores[:, :n_sims], scores[:, n_sims:]
+    games = [(first, second), (second, first)] if antithetic else [(first, second)]
+
+    with instrument.phase("lookup"):
+        units = sum(outcome_values(p1_score + p1[p1_rows], p2_score + p2[p2_row], table)
+                    for p1, p2 in games) / len(games)
+    if control_variate:
+        p1_means = np.array([means[x] for x in X_VALUES])[:, None]
+        controls = np.stack([
+            sum(p1[p1_rows] for p1, _ in games) / len(games) - p1_means,
+            np.broadcast_to(sum(p2[p2_row] for _, p2 in games) / len(games) - means[p2_x], units.shape),
+        ], axis=-1)
+        units = _regress_out(units, controls)
+    return units.mean(axis=1), units
+
+
+def _regress_out(values, controls):
+    """
+    Control variate adjustment: values (k, n) minus controls (k, n, c)
+    (deviations from known means, so zero mean) times the least-squares
+    coefficients fitted per row.
+    """
+    centered = controls - controls.mean(axis=1, keepdims=True)
+    cov = np.einsum("kni,knj->kij", centered, centered)
+    cross = np.einsum("kni,kn->ki", centered, values - values.mean(axis=1, keepdims=True))
+    # pinv: a constant control (e.g. STRAT(0) always scores 0) is singular
+    beta = np.einsum("kij,kj->ki", np.linalg.pinv(cov), cross)
+    return values - np.einsum("kni,ki->kn", controls, beta)
 
-            if win_rate > best_win_rate:
-                best_win_rate = win_rate
-                best_x = p1_x
 
-        optimal_strategies[(p1_score, p2_score)] = best_x
-        win_probs[(p1_score, p2_score)] = best_win_rate
+def estimate_diagnostics(win_rates, se, difference_se):
+    """
+    Returns the per-state precision diagnostics of a sampled estimate:
+        se, ci: standard error and CI_Z confidence interval of the chosen
+                (first best) X's win rate
+        runner_up, gap, gap_se: the next best X, how far behind it is and
+                the standard error of that gap
+    difference_se(i, j) gives the standard error of win_rates[i] - win_rates[j].
+    """
+    best = int(np.argmax(win_rates))
+    diagnostics = {
+        "se": float(se[best]),
+        "ci": [float(win_rates[best] - CI_Z * se[best]), float(win_rates[best] + CI_Z * se[best])],
+    }
+    if len(win_rates) > 1:
+        others = np.where(np.arange(len(win_rates)) == best, -np.inf, win_rates)
+        runner_up = int(np.argmax(others))
+        diagnostics.update(
+            runner_up=X_VALUES[runner_up],
+            gap=float(win_rates[best] - win_rates[runner_up]),
+            gap_se=float(difference_se(best, runner_up)),
+        )
+    return diagnostics
+
+
+def wavefronts():
+    """
+    Yields the game states in backwards-induction order as groups that can
+    be evaluated in parallel.
+
+    A state's successors all have a score sum at least as large, and the
+    only successor on its own anti-diagonal is itself (which is unsolved at
+    that point).  Within a diagonal the serial order only matters for the
+    mirrored state (p2, p1) that fixes P2's strategy: it is solved before
+    (p1, p2) exactly when p2 < p1.  So each diagonal splits into two
+    independent phases, p1 <= p2 first and then p1 > p2.
+    """
+    for total in range(2 * SCORE_STEPS[-1], -1, -10):
+        diagonal = [(p1, total - p1) for p1 in SCORE_STEPS if total - p1 in SCORE_STEPS]
+        yield [(p1, p2) for p1, p2 in diagonal if p1 <= p2]
+        yield [(p1, p2) for p1, p2 in diagonal if p1 > p2]
 
-    return optimal_strategies, win_probs
 
+_worker = {}
+
+
+def _init_worker(method, pmfs, seed, instrumented=False, means=None):
+    """Stores the per-run inputs of the tasks below in this process."""
+    _worker.update(method=method, pmfs=pmfs, seed=seed, means=means)
+    if instrumented:
+        instrument.enable()
+
+
+def _instrumented_task(job):
+    """
+    Runs func(task) in a pool worker and returns (result, instrument
+    snapshot of that task) for the parent to merge.
+    """
+    func, task = job
+    instrument.reset()
+    result = func(task)
+    return result, instrument.snapshot()
+
+
+def _race_task(task):
+    """
+    Races all candidates for one state with an RNG seeded from (seed,
+    state), so the outcome does not depend on which process runs it.
+    """
+    p1_score, p2_score, p2_x, table = task
+    rng = np.random.default_rng(np.random.SeedSequence([_worker["seed"], p1_score, p2_score]))
+    return race_strategies(p1_score, p2_score, p2_x, table, rng)
+
+
+def _crn_task(task):
+    """
+    Evaluates every candidate for one state with evaluate_strategies_crn,
+    seeded from (seed, state) like _race_task.  Returns (win_rates,
+    estimate_diagnostics) so the per-deck values stay in the worker.
+    """
+    p1_score, p2_score, p2_x, table = task
+    rng = np.random.default_rng(np.random.SeedSequence([_worker["seed"], p1_score, p2_score]))
+    win_rates, units = evaluate_strategies_crn(p1_score, p2_score, p2_x, table, _worker["means"], rng,
+                                               CRN_SIMS_PER_STRATEGY)
+    n = units.shape[1]
+    se = units.std(axis=1, ddof=1) / np.sqrt(n)
+
+    def difference_se(i, j):
+        return (units[i] - units[j]).std(ddof=1) / np.sqrt(n)
+
+    return win_rates, estimate_diagnostics(win_rates, se, difference_se)
+
+
+def _evaluate_task(task):
+    """
+    Evaluates one (state, p1_x) pair.  context is the continuation_table
+    for the distribution methods, or win_probs for the sampled method,
+    which reseeds `random` from (seed, state, p1_x) so that the outcome
+    does not depend on which process runs the task, and returns
+    (win rate, standard error).
+    """
+    p1_score, p2_score, p1_x, p2_x, context = task
+    if _worker["method"] != "sampled":
+        pmfs = _worker["pmfs"]
+        return evaluate_strategy_exact(p1_score, p2_score, pmfs[p1_x], pmfs[p2_x], context)
+
+    seed_seq = np.random.SeedSequence([_worker["seed"], p1_score, p2_score, p1_x])
+    random.seed(int(seed_seq.generate_state(1, np.uint64)[0]))
+    return evaluate_strategy(p1_score, p2_score, p1_x, p2_x, context, None, SIMS_PER_STRATEGY, with_se=True)
+
+
+def run_parameters(method, seed):
+    """Returns the parameters that identify an induction run."""
+    return {
+        "x_values": X_VALUES,
+        "score_steps": SCORE_STEPS,
+        "sims_per_strategy": CRN_SIMS_PER_STRATEGY if method == "crn" else SIMS_PER_STRATEGY,
+        "win_threshold": WIN_THRESHOLD,
+        "method": method,
+        "seed": seed
+    }
+
+
+def save_checkpoint(filepath, parameters, optimal_strategies, win_probs, diagnostics):
+    """
+    Atomically writes the completed states of an induction run, so a crash
+    mid-write leaves the previous checkpoint intact.  Sampling is seeded
+    per state from parameters["seed"], so the seed is the whole RNG state.
+    """
+    checkpoint = {
+        "parameters": parameters,
+        "optimal_strategies": {f"{k[0]},{k[1]}": v for k, v in optimal_strategies.items()},
+        "win_probs": {f"{k[0]},{k[1]}": v for k, v in win_probs.items()},
+        "diagnostics": {f"{k[0]},{k[1]}": v for k, v in (diagnostics or {}).items()},
+    }
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+
+
+def load_checkpoint(filepath, parameters):
+    """
+    Returns (optimal_strategies, win_probs, diagnostics) from a checkpoint.
+    Raises ValueError if it was made with different run parameters.
+    """
+    with open(filepath, "r") as f:
+        checkpoint = json.load(f)
+
+    mismatched = [k for k, v in parameters.items() if checkpoint["parameters"].get(k) != v]
+    if mismatched:
+        raise ValueError(
+            f"{filepath} was made with different {', '.join(mismatched)}; "
+            f"rerun with matching settings or delete it to start over"
+        )
 
-def save_results(optimal_strategies, win_probs):
-    """Save results to data directory."""
-    os.makedirs(DATA_DIR, exist_ok=True)
+    def decode(d):
+        return {tuple(map(int, k.split(","))): v for k, v in d.items()}
 
+    return (decode(checkpoint["optimal_strategies"]), decode(checkpoint["win_probs"]),
+            decode(checkpoint["diagnostics"]))
+
+
+def compute_optimal_strategies(method="exact", workers=1, seed=0, diagnostics=None,
+                               checkpoint=None, resume=False):
+    """
+    Use backwards induction to compute optimal strategies for all states.
+
+    The states of each wavefront (see wavefronts), and the X_VALUES
+    candidates inside each state, are evaluated on a pool of `workers`
+    processes (inline when workers is 1).  Results are merged before the
+    next wavefront starts, so they are identical for any number of workers.
+    The racing and crn methods run one task per state instead.
+    diagnostics (if given) is filled per state with {"sims_used", "margin"}
+    for racing, and the estimate_diagnostics (standard error, confidence
+    interval and gap to the runner-up) for sampled and crn.
+
+    If checkpoint is a path, progress is saved there after every wavefront.
+    With resume, the states in an existing checkpoint (which must match
+    this run's parameters) are reused and induction continues after them.
+
+    Returns:
+        optimal_strategies: dict mapping (p1_score, p2_score) -> best X for P1
+        win_probs: dict mapping (p1_score, p2_score) -> P1 win probability
+    """
+    optimal_strategies = {}
+    win_probs = {}
+    if diagnostics is None:
+        diagnostics = {}
+
+    parameters = run_parameters(method, seed)
+    if resume and checkpoint and os.path.exists(checkpoint):
+        optimal_strategies, win_probs, saved_diagnostics = load_checkpoint(checkpoint, parameters)
+        diagnostics.update(saved_diagnostics)
+        print(f"Resuming from {checkpoint} with {len(optimal_strategies)} completed states")
+
+    n_states = len(SCORE_STEPS) ** 2
+    print(f"Computing optimal strategies for {n_states} states...")
+    if method == "sampled":
+        print(f"Testing {len(X_VALUES)} strategy values with {SIMS_PER_STRATEGY} simulations each")
+        pmfs = None
+    elif method == "racing":
+        print(f"Racing {len(X_VALUES)} strategy values with up to {SIMS_PER_STRATEGY} simulations each")
+        pmfs = None
+    elif method == "crn":
+        print(f"Testing {len(X_VALUES)} strategy values on {CRN_SIMS_PER_STRATEGY} shared antithetic deck pairs")
+        pmfs = None
+    else:
+        print(f"Testing {len(X_VALUES)} strategy values against {method} score distributions")
+        with instrument.phase("pmfs"):
+            pmfs = build_score_pmfs(method)
+
+    means = None
+    if method == "crn":
+        # Known means of the control variate
+        means = {}
+        for x in set(X_VALUES) | {DEFAULT_P2_X}:
+            pmf = score_pmf(x)
+            means[x] = float(np.arange(len(pmf)) @ pmf)
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                    initargs=(method, pmfs, seed, instrument.enabled, means))
+    else:
+        _init_worker(method, pmfs, seed, means=means)
+
+    def run(func, tasks):
+        if pool is None:
+            return list(map(func, tasks))
+        chunksize = max(1, len(tasks) // (4 * workers))
+        if not instrument.enabled:
+            return pool.map(func, tasks, chunksize)
+        # Worker phase timings come back with each result
+        results = []
+        for result, snapshot in pool.map(_instrumented_task, [(func, task) for task in tasks], chunksize):
+            instrument.merge(snapshot)
+            results.append(result)
+        return results
+
+    try:
+        with tqdm(total=n_states, initial=len(optimal_strategies), desc="Backwards induction") as progress:
+            for states in wavefronts():
+                if all(state in optimal_strategies for state in states):
+                    continue
+                with instrument.phase("table"):
+                    context = win_probs if method == "sampled" else continuation_table(win_probs)
+                # P2 uses their optimal strategy for the symmetric position
+                # (opponent's perspective: their score is p2_score, opponent has p1_score)
+                p2_xs = [optimal_strategies.get((p2, p1), DEFAULT_P2_X) for p1, p2 in states]
+
+                if method == "racing":
+                    tasks = [state + (p2_x, context) for state, p2_x in zip(states, p2_xs)]
+                    for state, (best_x, win_rate, sims_used, margin) in zip(states, run(_race_task, tasks)):
+                        optimal_strategies[state] = best_x
+                        win_probs[state] = win_rate
+                        diagnostics[state] = {"sims_used": sims_used, "margin": margin}
+                elif method == "crn":
+                    tasks = [state + (p2_x, context) for state, p2_x in zip(states, p2_xs)]
+                    for state, (win_rates, state_diagnostics) in zip(states, run(_crn_task, tasks)):
+                        best = int(np.argmax(win_rates))
+                        optimal_strategies[state] = X_VALUES[best]
+                        win_probs[state] = float(win_rates[best])
+                        diagnostics[state] = state_diagnostics
+                else:
+                    tasks = []
+                    for (p1_score, p2_score), p2_x in zip(states, p2_xs):
+                        for p1_x in X_VALUES:
+                            tasks.append((p1_score, p2_score, p1_x, p2_x, context))
+                    win_rates = run(_evaluate_task, tasks)
+                    if method == "sampled":
+                        win_rates, ses = zip(*win_rates)
+
+                    # For each state, the best response is the first X with the highest win rate
+                    for i, state in enumerate(states):
+                        best_x = 0
+                        best_win_rate = -1
+                        for p1_x, win_rate in zip(X_VALUES, win_rates[i * len(X_VALUES):(i + 1) * len(X_VALUES)]):
+                            if win_rate > best_win_rate:
+                                best_win_rate = win_rate
+                                best_x = p1_x
+                        optimal_strategies[state] = best_x
+                        win_probs[state] = best_win_rate
+                        if method == "sampled":
+                            se = np.array(ses[i * len(X_VALUES):(i + 1) * len(X_VALUES)])
+                            diagnostics[state] = estimate_diagnostics(
+                                np.array(win_rates[i * len(X_VALUES):(i + 1) * len(X_VALUES)]), se,
+                                lambda j, k: np.hypot(se[j], se[k]))  # independent samples
+
+                if checkpoint:
+                    with instrument.phase("io"):
+                        save_checkpoint(checkpoint, parameters, optimal_strategies, win_probs, diagnostics)
+                progress.update(len(states))
+                if instrument.enabled:
+                    instrument.count("states", len(states))
+                    instrument.sample()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return optimal_strategies, win_probs
+
+
+def save_results(optimal_strategies, win_probs, method, seed=None,
+                 filepath=None, parameters=None, diagnostics=None):
+    """
+    Save results to data directory (or filepath).  method is recorded as the
+    method that produced them (see --method).  parameters overrides or
+    extends the recorded run parameters; diagnostics holds optional
+    per-state details such as the racing simulation counts.
+    """
     # Convert tuple keys to strings for JSON serialization
     results = {
         "optimal_strategies": {f"{k[0]},{k[1]}": v for k, v in optimal_strategies.items()},
         "win_probs": {f"{k[0]},{k[1]}": v for k, v in win_probs.items()},
-        "parameters": {
-            "x_values": X_VALUES,
-            "score_steps": SCORE_STEPS,
-            "sims_per_strategy": SIMS_PER_STRATEGY,
-            "win_threshold": WIN_THRESHOLD
-        }
+        "parameters": run_parameters(method, seed)
     }
+    results["parameters"].update(parameters or {})
+    if diagnostics:
+        results["diagnostics"] = {f"{k[0]},{k[1]}": v for k, v in diagnostics.items()}
 
-    filepath = os.path.join(DATA_DIR, "multisim_results.json")
+    if filepath is None:
+        filepath = RESULTS_PATH
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
     with open(filepath, "w") as f:
         json.dump(results, f, indent=2)
 
@@ -138,9 +643,10 @@ def save_results(optimal_strategies, win_probs):
     return filepath
 
 
-def load_results():
-    """Load results from data directory."""
-    filepath = os.path.join(DATA_DIR, "multisim_results.json")
+def load_results(filepath=None):
+    """Load results from data directory (or filepath)."""
+    if filepath is None:
+        filepath = RESULTS_PATH
 
     with open(filepath, "r") as f:
         data = json.load(f)
@@ -160,11 +666,68 @@ def load_results():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Flip7 two-player strategy optimizer")
+    parser.add_argument(
+        "--method", choices=METHODS, default="exact",
+        help="Hand score distributions: exact (exact.py), data (stored simulation "
+             "results), sampled (fresh simulations per state, the original method), "
+             "racing (sampled, dropping clearly beaten X values early) or crn (sampled with "
+             "common random numbers, antithetic decks and a control variate)",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed for --method sampled, racing or crn; omit for a fresh one (saved with the results)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH,
+                        help=f"Progress file, rewritten after every wavefront; an empty value disables "
+                             f"checkpointing (default: {CHECKPOINT_PATH})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the checkpoint of an interrupted run with the same settings")
+    parser.add_argument("--instrument", action="store_true",
+                        help=f"Time the induction phases and write a report to {INSTRUMENTATION_PATH}")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Like --instrument, and also run under cProfile with the stats dumped to "
+                             f"{PROFILE_PATH} (main process only)")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    seed = args.seed
+    if seed is None and args.resume and args.checkpoint and os.path.exists(args.checkpoint):
+        with open(args.checkpoint, "r") as f:
+            seed = json.load(f)["parameters"]["seed"]
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+
     print("Flip7 Multi-Player Strategy Optimizer")
     print("=" * 50)
 
-    optimal_strategies, win_probs = compute_optimal_strategies()
-    save_results(optimal_strategies, win_probs)
+    diagnostics = {}
+    report_path = INSTRUMENTATION_PATH if args.instrument or args.profile else None
+    profile_path = PROFILE_PATH if args.profile else None
+    with instrument.session(report_path, profile_path, method=args.method, workers=args.workers, seed=seed):
+        try:
+            optimal_strategies, win_probs = compute_optimal_strategies(
+                args.method, args.workers, seed, diagnostics, args.checkpoint, args.resume
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        with instrument.phase("io"):
+            save_results(optimal_strategies, win_probs, args.method, seed, diagnostics=diagnostics)
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    if args.method == "racing":
+        sims_used = sum(d["sims_used"] for d in diagnostics.values())
+        full_budget = len(diagnostics) * len(X_VALUES) * SIMS_PER_STRATEGY
+        separated = sum(d["margin"] > 0 for d in diagnostics.values())
+        print(f"\nRacing used {sims_used} P1 hands ({sims_used / full_budget:.1%} of the full budget); "
+              f"chosen X separated from all others in {separated}/{len(diagnostics)} states")
+    elif diagnostics:
+        ses = [d["se"] for d in diagnostics.values()]
+        separated = sum(d["gap"] > CI_Z * d["gap_se"] for d in diagnostics.values() if "gap" in d)
+        print(f"\nWin rate standard error: median {np.median(ses):.4f}, max {np.max(ses):.4f}; "
+              f"chosen X ahead of the runner-up by more than {CI_Z} SE in {separated}/{len(diagnostics)} states")
 
     # Print summary
     print("\nSample optimal strategies:")
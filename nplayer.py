@@ -0,0 +1,330 @@
+"""
+nplayer.py - Backwards induction for Flip7 games with N players.
+
+    python nplayer.py --players 2,3,4
+    python nplayer.py --players 5,6 --step 20
+
+The state is P1's score and the scores of the N - 1 opponents, rounded down
+to multiples of --step as in multisim.py.  Opponents are interchangeable, so
+a state is stored once with the opponent scores sorted: for 4 players and
+20 score steps that is 30,800 canonical states instead of 160,000.  P1's
+optimal X and win probability are dense arrays indexed by canonical state.
+
+Every player plays one hand per round, all with state-independent score
+distributions.  With the opponents' strategies fixed, P1's win probability
+for every X at once is
+
+    continuation: the value array, expanded to all opponent orders and
+        zero padded past the threshold, is gathered in one window per
+        state and contracted with each opponent's per-step score
+        distribution in turn, then with every X's
+    terminal: when P1's hand crosses the threshold at exact score n, P1
+        wins if every opponent ends below n and splits ties evenly, i.e.
+        the integral over z in [0, 1] of prod_k (P(s_k < n) + P(s_k = n) z)
+    self-loop: the state recurs only when every hand moves less than one
+        step, solved as V = E / (1 - Q_X[0] * prod_k Q_Yk[0]) as in
+        value_iteration.py, Q being the per-step distributions
+
+A state's successors have a larger score sum except itself, so each
+anti-diagonal (wavefront) only depends on the ones already solved.
+Opponents follow multisim's rule for P2: an opponent plays P1's optimal
+strategy at the state as seen from their seat if that is already solved,
+else STRAT(25).  That view is on the same wavefront with the opponent's
+score as P1's, so each wavefront is solved in phases by ascending P1 score,
+and an opponent behind P1 plays their own optimum while the others play
+STRAT(25).  For 2 players this is exactly multisim's order.  (Iterating
+best responses to a fixed point instead does not converge: as noted in
+value_iteration.py, pure best responses commonly cycle.)
+
+Runtime and memory grow with N: the gathered windows hold L^N values per
+state, L being the number of score steps a hand can move.  4 players at the
+default step take seconds; 5 and 6 players want --step 20.
+"""
+
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from tqdm import tqdm
+
+from multisim import X_VALUES, WIN_THRESHOLD, DEFAULT_P2_X
+from pmf_cache import score_pmf
+from sim import DATA_DIR, parse_x_values
+
+DEFAULT_STEP = 10
+CHUNK_VALUES = 1 << 22  # gathered window values per contraction chunk
+REPORT_PATH = os.path.join(DATA_DIR, "nplayer_report.json")
+
+
+def get_results_path(n_players):
+    return os.path.join(DATA_DIR, f"nplayer_{n_players}.npz")
+
+
+# -----------------------------------------------------------------------------
+# Canonical states
+# -----------------------------------------------------------------------------
+
+
+def canonical_states(n_players, n_steps):
+    """
+    Returns (states, index_map): the canonical states as an (S, n_players)
+    array of score steps, P1 first and the opponents ascending, and the
+    (n_steps,) * n_players array of the canonical index of every state.
+    """
+    shape = (n_steps,) * n_players
+    full = np.indices(shape).reshape(n_players, -1)
+    full[1:] = np.sort(full[1:], axis=0)
+    keys, index_map = np.unique(np.ravel_multi_index(full, shape), return_inverse=True)
+    states = np.stack(np.unravel_index(keys, shape), axis=1)
+    return states, index_map.reshape(shape)
+
+
+def seat_views(states, index_map):
+    """
+    Returns an (S, n_players - 1) array: the canonical index of each state
+    as seen by each opponent, who is then P1 and P1 one of their opponents.
+    """
+    n_players = states.shape[1]
+    views = []
+    for k in range(1, n_players):
+        others = [0] + [j for j in range(1, n_players) if j != k]
+        views.append(index_map[tuple(states[:, [k] + others].T)])
+    return np.stack(views, axis=1)
+
+
+def canonical_index(solution, p1_score, opponent_scores):
+    """Returns the canonical state index of actual scores in solution."""
+    step = solution["step"]
+    coords = [min(p1_score, solution["win_threshold"] - 1) // step]
+    coords += sorted(min(score, solution["win_threshold"] - 1) // step for score in opponent_scores)
+    if len(coords) != solution["n_players"]:
+        raise ValueError(f"expected {solution['n_players'] - 1} opponent scores")
+    return int(solution["index_map"][tuple(coords)])
+
+
+def lookup(solution, p1_score, opponent_scores):
+    """Returns (optimal X, win probability) for P1 at the given scores."""
+    i = canonical_index(solution, p1_score, opponent_scores)
+    return int(solution["policy"][i]), float(solution["win_prob"][i])
+
+
+# -----------------------------------------------------------------------------
+# Distributions
+# -----------------------------------------------------------------------------
+
+
+def step_pmfs(pmfs, step):
+    """
+    Returns the (X, L) distributions of the number of score steps a hand
+    moves its player, i.e. of score // step.
+    """
+    n_buckets = -(-pmfs.shape[1] // step)
+    padded = np.pad(pmfs, ((0, 0), (0, n_buckets * step - pmfs.shape[1])))
+    return padded.reshape(len(pmfs), n_buckets, step).sum(axis=2)
+
+
+def tie_share(below, equal):
+    """
+    Returns P1's expected share of the win when P1 holds the top score
+    against opponents independently below it with probabilities below and
+    level with it with probabilities equal (both (..., m)): the integral over
+    [0, 1] of prod_k (below_k + equal_k z).
+    """
+    coeffs = np.ones(below.shape[:-1] + (1,))
+    for k in range(below.shape[-1]):
+        b, e = below[..., k, None], equal[..., k, None]
+        coeffs = np.concatenate([coeffs * b, np.zeros_like(b)], axis=-1) + \
+            np.concatenate([np.zeros_like(e), coeffs * e], axis=-1)
+    return coeffs @ (1.0 / np.arange(1, coeffs.shape[-1] + 1))
+
+
+# -----------------------------------------------------------------------------
+# Solver
+# -----------------------------------------------------------------------------
+
+
+def _evaluate(ids, opponent_rows, states, windows, exact, cdf, steps, n_x, step, win_threshold):
+    """
+    Returns the (len(ids), n_x) win probabilities of P1 playing each X at
+    the canonical states ids, with the opponents playing the distribution
+    rows opponent_rows (len(ids), m).
+    """
+    n_players = states.shape[1]
+    coords = states[ids]
+    scores = coords * step
+
+    # Continuation: contract each opponent's step distribution out of the windows
+    window = windows[tuple(coords.T)]
+    for k in range(n_players - 1, 0, -1):
+        window = np.einsum("b...l,bl->b...", window, steps[opponent_rows[:, k - 1]])
+    expected = window @ steps[:n_x].T
+
+    # Terminal: P1 crosses the threshold at exact score win_threshold + o
+    offsets = np.arange(exact.shape[1] - win_threshold)
+    p1_index = win_threshold - scores[:, :1] + offsets  # P1's hand score
+    opponent_index = win_threshold - scores[:, 1:, None] + offsets  # each opponent's
+    rows = opponent_rows[:, :, None]
+    share = tie_share(np.moveaxis(cdf[rows, opponent_index - 1], 1, -1),
+                      np.moveaxis(exact[rows, opponent_index], 1, -1))
+    expected += np.einsum("bxo,bo->bx", exact[:n_x][:, p1_index].transpose(1, 0, 2), share)
+
+    # Self-loop: every hand moves less than a step; if that is certain, the game is a tie
+    stay = steps[:n_x, 0][None, :] * np.prod(steps[opponent_rows, 0], axis=1)[:, None]
+    denom = 1.0 - stay
+    return np.divide(expected, denom, out=np.full_like(expected, 1.0 / n_players), where=denom > 1e-12)
+
+
+def solve(n_players, x_values=X_VALUES, step=DEFAULT_STEP, win_threshold=WIN_THRESHOLD,
+          progress=True, **rules):
+    """
+    Solves the n_players game on the step grid below win_threshold, with the
+    hand distributions of rules (deck_counts, flip_seven_bonus).
+
+    Returns a dict with the canonical "states" (score steps), P1's optimal
+    "policy" X and "win_prob" there, the "index_map" used by lookup(), the
+    settings and "stats" (state counts and array sizes).
+    """
+    if n_players < 2:
+        raise ValueError("the game needs at least 2 players")
+    if win_threshold % step:
+        raise ValueError(f"the win threshold {win_threshold} is not a multiple of the step {step}")
+    n_steps = win_threshold // step
+    x_values = [int(x) for x in x_values]
+    n_x = len(x_values)
+
+    # Rows 0..n_x-1 are the candidate X values; the last is STRAT(DEFAULT_P2_X)
+    pmfs = [score_pmf(x, **rules) for x in x_values + [DEFAULT_P2_X]]
+    size = max(len(pmf) for pmf in pmfs)
+    pmfs = np.array([np.pad(pmf, (0, size - len(pmf))) for pmf in pmfs])
+    steps = step_pmfs(pmfs, step)
+    n_buckets = steps.shape[1]
+    # Exact PMFs and CDFs indexed by hand score, padded to cover every offset
+    exact = np.pad(pmfs, ((0, 0), (0, win_threshold)))
+    cdf = np.cumsum(exact, axis=1)
+    default_row = n_x
+
+    states, index_map = canonical_states(n_players, n_steps)
+    views = seat_views(states, index_map)
+    n_states = len(states)
+    totals = states.sum(axis=1)
+    policy_row = np.full(n_states, default_row)
+    win_prob = np.zeros(n_states)
+
+    # Values of every ordered state, zero past the threshold (terminal
+    # outcomes are counted separately) and for unsolved states
+    values = np.zeros((n_steps + n_buckets - 1,) * n_players)
+    inner = (slice(0, n_steps),) * n_players
+    windows = sliding_window_view(values, (n_buckets,) * n_players)
+    chunk = max(1, CHUNK_VALUES // n_buckets ** n_players)
+
+    for total in tqdm(range(totals.max(), -1, -1), desc=f"{n_players} players", disable=not progress):
+        wavefront = totals == total
+        # Phases by ascending P1 score: an opponent behind P1 sees the state
+        # with a lower P1 score, solved in an earlier phase
+        for p1_step in np.unique(states[wavefront, 0]):
+            ids = np.flatnonzero(wavefront & (states[:, 0] == p1_step))
+            opponent_rows = np.where(states[ids, 1:] < p1_step, policy_row[views[ids]], default_row)
+            for start in range(0, len(ids), chunk):
+                part = ids[start:start + chunk]
+                win_rates = _evaluate(part, opponent_rows[start:start + chunk], states, windows,
+                                      exact, cdf, steps, n_x, step, win_threshold)
+                policy_row[part] = np.argmax(win_rates, axis=1)
+                win_prob[part] = win_rates.max(axis=1)
+        values[inner] = win_prob[index_map]
+
+    return {
+        "n_players": n_players,
+        "step": step,
+        "win_threshold": win_threshold,
+        "x_values": x_values,
+        "states": states,
+        "index_map": index_map,
+        "policy": np.asarray(x_values)[policy_row],
+        "win_prob": win_prob,
+        "stats": {
+            "canonical_states": n_states,
+            "ordered_states": n_steps ** n_players,
+            "table_bytes": states.nbytes + 2 * n_states * 8,
+            "value_array_bytes": values.nbytes + index_map.nbytes,
+        },
+    }
+
+
+def save_solution(solution, filepath=None):
+    """Saves a solution's arrays and settings as .npz."""
+    filepath = filepath or get_results_path(solution["n_players"])
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    np.savez_compressed(
+        filepath, states=solution["states"], index_map=solution["index_map"],
+        policy=solution["policy"], win_prob=solution["win_prob"],
+        x_values=np.asarray(solution["x_values"]),
+        settings=np.array([solution["n_players"], solution["step"], solution["win_threshold"]]),
+    )
+    return filepath
+
+
+def load_solution(n_players=None, filepath=None):
+    """Loads a save_solution() file (by player count, or filepath)."""
+    with np.load(filepath or get_results_path(n_players)) as data:
+        n, step, win_threshold = (int(v) for v in data["settings"])
+        return {
+            "n_players": n,
+            "step": step,
+            "win_threshold": win_threshold,
+            "x_values": data["x_values"].tolist(),
+            "states": data["states"],
+            "index_map": data["index_map"],
+            "policy": data["policy"],
+            "win_prob": data["win_prob"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="N-player Flip7 strategy optimizer")
+    parser.add_argument("--players", type=parse_x_values, default=[2, 3, 4],
+                        help='Player counts to solve, e.g. "2..4" or "3,5" (default: 2,3,4)')
+    parser.add_argument("--step", type=int, default=DEFAULT_STEP,
+                        help=f"Score rounding step (default: {DEFAULT_STEP}); 20 makes 5-6 players practical")
+    parser.add_argument("--x", type=parse_x_values, default=X_VALUES,
+                        help='Candidate strategy thresholds, e.g. "0..100:5" (default)')
+    args = parser.parse_args()
+
+    # Hand distributions are shared by every player count; build them first
+    # so the timings and memory peaks are the induction's own
+    for x in args.x + [DEFAULT_P2_X]:
+        score_pmf(x)
+
+    report = []
+    for n_players in args.players:
+        tracemalloc.start()
+        start = time.time()
+        try:
+            solution = solve(n_players, args.x, args.step)
+        except ValueError as e:
+            parser.error(str(e))
+        seconds = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        path = save_solution(solution)
+        stats = dict(solution["stats"], n_players=n_players, step=args.step, seconds=seconds,
+                     peak_bytes=peak)
+        report.append(stats)
+        x, p = lookup(solution, 0, [0] * (n_players - 1))
+        print(f"{n_players} players: {stats['canonical_states']:,} states "
+              f"({stats['ordered_states']:,} ordered) in {seconds:.1f}s, peak memory "
+              f"{peak / 2**20:.0f} MB; "
+              f"opening STRAT({x}) wins {p:.2%}.  Saved to {path}")
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nRuntime and memory report saved to {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+pmf_cache.py - Persistent cache of STRAT(X) hand score distributions.
+
+score_pmf(X) returns the total_value PMF of one hand of STRAT(X) as an
+array indexed by score, computed exactly (exact.py) or estimated from n
+sampled hands (batch_sim.py).  Each distribution is computed once and then
+served from, in order,
+
+    memory: a per-process dict (microseconds)
+    disk:   one .npy file per distribution under data/pmf_cache/
+
+Entries are keyed by a hash of the deck composition, the Flip 7 bonus, the
+source of the scoring rules (sim.calculate_score, sim.HandState and the
+estimating engine), X and the estimation method, so editing the rules or
+the deck never serves a stale distribution.
+
+Files are written to a temporary name and renamed into place, so readers
+never need the lock and never see a partial entry.  Writers and eviction
+hold an fcntl lock on data/pmf_cache/.lock.  A hit refreshes the file's
+mtime; once the directory exceeds MAX_CACHE_BYTES, the least recently used
+entries are deleted.
+"""
+
+import fcntl
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+
+import cards
+import sim
+from sim import DECK_COUNTS, DATA_DIR
+
+CACHE_DIR = os.path.join(DATA_DIR, "pmf_cache")
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+FLIP_SEVEN_BONUS = sim.FLIP_SEVEN_BONUS
+
+_memory = {}
+_rules_hashes = {}
+
+
+def _rules_hash(method):
+    """
+    Returns a hash of the source of the deck and scoring rules and of the
+    engine that estimates distributions with method.
+    """
+    cached = _rules_hashes.get(method)
+    if cached is not None:
+        return cached
+    if method == "exact":
+        import exact as engine
+    else:
+        import batch_sim as engine
+    digest = hashlib.sha256()
+    for source in (cards, sim.calculate_score, sim.HandState, engine):
+        digest.update(inspect.getsource(source).encode())
+    _rules_hashes[method] = digest.hexdigest()
+    return _rules_hashes[method]
+
+
+def cache_key(strategy_x, n_samples=None, seed=0, deck_counts=DECK_COUNTS,
+              flip_seven_bonus=FLIP_SEVEN_BONUS):
+    """
+    Returns the hex key of a distribution.  n_samples None means exact;
+    otherwise the PMF of n_samples hands sampled with seed.
+    """
+    method = "exact" if n_samples is None else "sampled"
+    fields = {
+        "deck_counts": [int(c) for c in deck_counts],
+        "flip_seven_bonus": flip_seven_bonus,
+        "rules": _rules_hash(method),
+        "strategy_x": int(strategy_x),
+        "method": method,
+        "n_samples": n_samples,
+        "seed": None if n_samples is None else seed,
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _compute(strategy_x, n_samples, seed, deck_counts, flip_seven_bonus):
+    if n_samples is None:
+        from exact import score_pmf_array
+        return score_pmf_array(strategy_x, deck_counts=deck_counts, flip_seven_bonus=flip_seven_bonus)
+
+    from batch_sim import run_simulations_batch
+    if tuple(deck_counts) != tuple(DECK_COUNTS) or flip_seven_bonus != FLIP_SEVEN_BONUS:
+        raise ValueError("sampled distributions are only available for the standard rules")
+    scores = run_simulations_batch(strategy_x, n_samples, np.random.default_rng(seed),
+                                   with_cards=False)["total_value"]
+    return np.bincount(scores) / n_samples
+
+
+def score_pmf(strategy_x, n_samples=None, seed=0, deck_counts=DECK_COUNTS,
+              flip_seven_bonus=FLIP_SEVEN_BONUS):
+    """
+    Returns the total_value PMF of STRAT(strategy_x) as a read-only array
+    indexed by score: exact by default, or the empirical PMF of n_samples
+    hands sampled with seed.
+    """
+    # The rules cannot change within a process, so memory skips the hashing
+    memory_key = (strategy_x, n_samples, seed, tuple(deck_counts), flip_seven_bonus)
+    pmf = _memory.get(memory_key)
+    if pmf is not None:
+        return pmf
+
+    key = cache_key(strategy_x, n_samples, seed, deck_counts, flip_seven_bonus)
+    path = os.path.join(CACHE_DIR, f"{key}.npy")
+    try:
+        pmf = np.load(path)
+    except (FileNotFoundError, ValueError, EOFError):
+        pmf = _compute(strategy_x, n_samples, seed, deck_counts, flip_seven_bonus)
+        _store(path, pmf)
+    else:
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            pass  # Evicted since; the copy in hand is still valid
+
+    pmf.setflags(write=False)
+    _memory[memory_key] = pmf
+    return pmf
+
+
+class _Lock:
+    """Exclusive fcntl lock on the cache directory, for writers."""
+
+    def __enter__(self):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.file = open(os.path.join(CACHE_DIR, ".lock"), "w")
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _store(path, pmf):
+    """Writes one entry atomically, then evicts down to MAX_CACHE_BYTES."""
+    with _Lock():
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(pmf, dtype=np.float64))
+        os.replace(tmp_path, path)
+        _evict(MAX_CACHE_BYTES)
+
+
+def evict(max_bytes=None):
+    """
+    Deletes the least recently used entries until the cache fits in
+    max_bytes (default MAX_CACHE_BYTES).
+    """
+    with _Lock():
+        _evict(MAX_CACHE_BYTES if max_bytes is None else max_bytes)
+
+
+def _evict(max_bytes):
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith(".npy"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+def clear_memory():
+    """Forgets the in-process copies (the disk cache is kept)."""
+    _memory.clear()
@@ -0,0 +1,385 @@
+"""
+policy.py - Fast lookup of the recommended strategy from a solved table.
+
+    python policy.py 120 80                     # my score, opponents' scores
+    python policy.py compile data/nplayer_4.npz
+    python policy.py serve --port 8765          # HTTP on 127.0.0.1
+    python policy.py serve --stdin              # one query per line
+
+A solved table (multisim_results.json in the multisim format, including
+value_iteration and variant results, value_iteration.npz or nplayer_N.npz) is
+compiled once into flat arrays over every ordered state:
+
+    <source without extension>.policy/
+        policy.npy     recommended X (int16)
+        win_prob.npy   P1's win probability (float64)
+        meta.json      grid, player count, X values and the source's size
+                       and mtime
+
+load_table() memory-maps the arrays, recompiling first only when the source
+changed, so a process starts answering in milliseconds.  A query clamps the
+scores to the grid and either takes the grid point at or below each score
+(the solvers' rounding) or, by default, interpolates multilinearly between
+the 2^N surrounding grid points: the win probability directly, and the X
+value rounded to the nearest integer (halves up).  Every query is O(1); batches are
+vectorized.
+
+The server only binds the loopback interface.  GET /policy?me=120&opp=80,150
+answers one query; POST /policy with {"queries": [[120, [80, 150]], ...]}
+answers a batch (an empty batch is a 400).  On stdin, each line "120 80 150"
+is answered by a line "X win_prob", and a blank line by a blank line.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# The solvers (and the HTTP server) are only imported when compiling (or
+# serving), so a process that just looks up a compiled table starts fast
+RESULTS_PATH = os.path.join("data", "multisim_results.json")  # multisim.RESULTS_PATH
+FORMAT_VERSION = 1
+DEFAULT_PORT = 8765
+# Interpolated X values round half up; the tolerance keeps exact halves
+# from depending on the summation order of the scalar and batch paths
+ROUND_UP = 0.5 + 1e-9
+
+
+def get_table_dir(source):
+    return os.path.splitext(source)[0] + ".policy"
+
+
+# -----------------------------------------------------------------------------
+# Compiling
+# -----------------------------------------------------------------------------
+
+
+def _read_source(source):
+    """
+    Returns (policy, win_prob, step, win_threshold, x_values) of a solved
+    table, with policy and win_prob dense over every ordered state.
+    """
+    if source.endswith(".json"):
+        from multisim import load_results
+        optimal_strategies, win_probs, params = load_results(source)
+        score_steps = params["score_steps"]
+        step = score_steps[1] - score_steps[0] if len(score_steps) > 1 else params["win_threshold"]
+        shape = (len(score_steps),) * 2
+        policy = np.zeros(shape, dtype=np.int16)
+        win_prob = np.zeros(shape)
+        for (p1, p2), x in optimal_strategies.items():
+            policy[p1 // step, p2 // step] = x
+            win_prob[p1 // step, p2 // step] = win_probs[(p1, p2)]
+        return policy, win_prob, step, params["win_threshold"], params["x_values"]
+
+    with np.load(source) as data:
+        if "index_map" in data:
+            # nplayer.py: canonical states, expanded to every opponent order
+            n_players, step, win_threshold = (int(v) for v in data["settings"])
+            index_map = data["index_map"]
+            return (data["policy"][index_map], data["win_prob"][index_map], step, win_threshold,
+                    data["x_values"].tolist())
+        # value_iteration.py: every exact score pair
+        policy = data["policy"]
+        return policy, data["win_prob"], 1, len(policy), data["x_values"].tolist()
+
+
+def _source_stat(source):
+    stat = os.stat(source)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def compile_table(source, table_dir=None):
+    """
+    Compiles a solved table into table_dir (default get_table_dir(source))
+    and returns table_dir.
+    """
+    table_dir = table_dir or get_table_dir(source)
+    policy, win_prob, step, win_threshold, x_values = _read_source(source)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "source": os.path.abspath(source),
+        **_source_stat(source),
+        "n_players": policy.ndim,
+        "n_steps": policy.shape[0],
+        "step": step,
+        "win_threshold": win_threshold,
+        "x_values": [int(x) for x in x_values],
+    }
+
+    # Each file is replaced atomically and meta.json last, so a reader sees
+    # either the old table or the new one with matching metadata
+    os.makedirs(table_dir, exist_ok=True)
+    for name, array in (("policy", policy.astype(np.int16)), ("win_prob", win_prob.astype(np.float64))):
+        tmp_path = os.path.join(table_dir, f"{name}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(array).ravel())
+        os.replace(tmp_path, os.path.join(table_dir, f"{name}.npy"))
+    tmp_path = os.path.join(table_dir, f"meta.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(table_dir, "meta.json"))
+    return table_dir
+
+
+def _is_current(table_dir, source):
+    try:
+        with open(os.path.join(table_dir, "meta.json"), "r") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+    return meta.get("format_version") == FORMAT_VERSION and \
+        {key: meta.get(key) for key in ("source_size", "source_mtime_ns")} == _source_stat(source)
+
+
+def load_table(source=RESULTS_PATH):
+    """
+    Returns the PolicyTable of a solved table, compiling it first if it was
+    never compiled or the source changed since.
+    """
+    table_dir = get_table_dir(source)
+    if not _is_current(table_dir, source):
+        compile_table(source, table_dir)
+    return PolicyTable(table_dir)
+
+
+# -----------------------------------------------------------------------------
+# Lookup
+# -----------------------------------------------------------------------------
+
+
+class PolicyTable:
+    """
+    A compiled table, memory-mapped.  Scores are (my score, opponents'
+    scores); opponents may be given in any order.
+    """
+
+    def __init__(self, table_dir):
+        with open(os.path.join(table_dir, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        # Plain ndarray views of the maps skip np.memmap's per-access overhead
+        self.policy = np.asarray(np.load(os.path.join(table_dir, "policy.npy"), mmap_mode="r"))
+        self.win_prob = np.asarray(np.load(os.path.join(table_dir, "win_prob.npy"), mmap_mode="r"))
+        self.n_players = self.meta["n_players"]
+        self.n_steps = self.meta["n_steps"]
+        if self.n_steps < 2:
+            # Interpolation needs a grid point on each side of a score
+            raise ValueError(f"{table_dir}: the table's grid has {self.n_steps} score step(s) per player, "
+                             f"at least 2 are needed")
+        self.step = self.meta["step"]
+        self.max_score = (self.n_steps - 1) * self.step
+        self.strides = [self.n_steps ** (self.n_players - 1 - k) for k in range(self.n_players)]
+        # Index offsets of the 2^N grid points around a score, in the order of
+        # the tensor-product interpolation weights (first player outermost)
+        self.offsets = np.array([sum(bit * stride for bit, stride in zip(corner, self.strides))
+                                 for corner in itertools.product((0, 1), repeat=self.n_players)])
+        self._offsets = self.offsets.tolist()
+
+    def _scores(self, my_score, opponent_scores):
+        scores = [my_score, *opponent_scores]
+        if len(scores) != self.n_players:
+            raise ValueError(f"expected {self.n_players - 1} opponent scores, got {len(scores) - 1}")
+        return scores
+
+    def lookup(self, my_score, opponent_scores, interpolate=True):
+        """Returns (recommended X, win probability) for one state."""
+        scores = self._scores(my_score, opponent_scores)
+        if not interpolate:
+            i = sum(min(max(int(s), 0), self.max_score) // self.step * stride
+                    for s, stride in zip(scores, self.strides))
+            return self.policy.item(i), self.win_prob.item(i)
+
+        base = 0
+        weights = [1.0]
+        for s, stride in zip(scores, self.strides):
+            position = min(max(s, 0), self.max_score) / self.step
+            low = min(int(position), self.n_steps - 2)
+            frac = position - low
+            base += low * stride
+            weights = [w * f for w in weights for f in (1.0 - frac, frac)]
+        x = p = 0.0
+        for weight, offset in zip(weights, self._offsets):
+            if weight:
+                x += weight * self.policy.item(base + offset)
+                p += weight * self.win_prob.item(base + offset)
+        return int(x + ROUND_UP), p
+
+    def lookup_batch(self, my_scores, opponent_scores, interpolate=True):
+        """
+        Vectorized lookup: my_scores (n,) and opponent_scores (n, N - 1).
+        Returns (X array, win probability array).
+        """
+        if len(my_scores) == 0:
+            raise ValueError("no queries given")
+        if len(opponent_scores) != len(my_scores):
+            raise ValueError(f"got {len(my_scores)} scores but {len(opponent_scores)} lists of opponent scores")
+        scores = np.column_stack([np.asarray(my_scores, dtype=np.float64),
+                                  np.asarray(opponent_scores, dtype=np.float64).reshape(len(my_scores), -1)])
+        if scores.shape[1] != self.n_players:
+            raise ValueError(f"expected {self.n_players - 1} opponent scores per query")
+        positions = np.clip(scores, 0, self.max_score) / self.step
+        if not interpolate:
+            i = (np.floor(positions).astype(np.int64) * self.strides).sum(axis=1)
+            return self.policy[i].astype(np.int64), self.win_prob[i]
+
+        lows = np.minimum(np.floor(positions), self.n_steps - 2).astype(np.int64)
+        fracs = positions - lows
+        weights = np.ones((len(scores), 1))
+        for k in range(self.n_players):
+            frac = fracs[:, k, None, None]
+            weights = (weights[:, :, None] * np.concatenate([1.0 - frac, frac], axis=2)).reshape(len(scores), -1)
+        index = (lows * self.strides).sum(axis=1)[:, None] + self.offsets
+        x = (weights * self.policy[index]).sum(axis=1)
+        p = (weights * self.win_prob[index]).sum(axis=1)
+        return np.floor(x + ROUND_UP).astype(np.int64), p
+
+
+# -----------------------------------------------------------------------------
+# Servers
+# -----------------------------------------------------------------------------
+
+
+def serve_stdin(table, interpolate=True, stdin=sys.stdin, stdout=sys.stdout):
+    """
+    Answers "my_score opp1 opp2 ..." lines with "X win_prob" lines, and a
+    blank line with an empty one, so every line gets a reply.
+    """
+    for line in stdin:
+        fields = line.split()
+        if not fields:
+            stdout.write("\n")
+        else:
+            try:
+                scores = [float(field) for field in fields]
+                x, p = table.lookup(scores[0], scores[1:], interpolate)
+                stdout.write(f"{x} {p:.6f}\n")
+            except ValueError as e:
+                stdout.write(f"error {e}\n")
+        stdout.flush()
+
+
+def make_handler(table, interpolate=True):
+    """Returns the HTTP request handler class serving table."""
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import parse_qs, urlparse
+
+    class PolicyHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so clients reuse one connection
+        # Headers and body go out in separate writes; without TCP_NODELAY a
+        # keep-alive client waits for the delayed ACK (~40 ms) on each query
+        disable_nagle_algorithm = True
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/policy":
+                return self._reply(404, {"error": "not found"})
+            query = parse_qs(url.query)
+            try:
+                me = float(query["me"][0])
+                opponents = [float(s) for s in query.get("opp", [""])[0].split(",") if s]
+                x, p = table.lookup(me, opponents, interpolate)
+            except (KeyError, ValueError) as e:
+                return self._reply(400, {"error": f"bad query: {e}"})
+            self._reply(200, {"x": x, "win_prob": p})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/policy":
+                return self._reply(404, {"error": "not found"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                queries = body["queries"]
+                xs, ps = table.lookup_batch([q[0] for q in queries], [q[1] for q in queries], interpolate)
+            except (KeyError, TypeError, IndexError, ValueError) as e:
+                return self._reply(400, {"error": f"bad queries: {e}"})
+            self._reply(200, {"x": xs.tolist(), "win_prob": ps.tolist()})
+
+        def log_message(self, format, *args):
+            pass  # One line per query would dominate the server's time
+
+    return PolicyHandler
+
+
+def serve_http(table, port=DEFAULT_PORT, interpolate=True):
+    """Serves table over HTTP on 127.0.0.1:port until interrupted."""
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(table, interpolate))
+    print(f"Serving {table.meta['source']} on http://127.0.0.1:{server.server_port}/policy")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# -----------------------------------------------------------------------------
+# Command line
+# -----------------------------------------------------------------------------
+
+
+def main_compile(argv):
+    parser = argparse.ArgumentParser(prog="policy.py compile", description="Compile a solved strategy table")
+    parser.add_argument("source", nargs="?", default=RESULTS_PATH,
+                        help=f"Solved table (default: {RESULTS_PATH})")
+    args = parser.parse_args(argv)
+    start = time.time()
+    table_dir = compile_table(args.source)
+    print(f"Compiled {args.source} to {table_dir}/ in {time.time() - start:.2f}s")
+
+
+def main_serve(argv):
+    parser = argparse.ArgumentParser(prog="policy.py serve", description="Serve strategy lookups locally")
+    parser.add_argument("--source", default=RESULTS_PATH, help=f"Solved table (default: {RESULTS_PATH})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"HTTP port on 127.0.0.1 (default: {DEFAULT_PORT})")
+    parser.add_argument("--stdin", action="store_true", help="Answer queries on stdin instead of HTTP")
+    parser.add_argument("--no-interpolate", action="store_true",
+                        help="Use the grid point at or below each score")
+    args = parser.parse_args(argv)
+
+    table = load_table(args.source)
+    if args.stdin:
+        serve_stdin(table, not args.no_interpolate)
+    else:
+        serve_http(table, args.port, not args.no_interpolate)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "compile":
+        main_compile(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        main_serve(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="Look up the recommended Flip7 strategy")
+    parser.add_argument("my_score", type=float, help="Your score")
+    parser.add_argument("opponent_scores", type=float, nargs="+", help="Each opponent's score")
+    parser.add_argument("--source", default=RESULTS_PATH, help=f"Solved table (default: {RESULTS_PATH})")
+    parser.add_argument("--no-interpolate", action="store_true",
+                        help="Use the grid point at or below each score")
+    args = parser.parse_args()
+
+    try:
+        table = load_table(args.source)
+        x, p = table.lookup(args.my_score, args.opponent_scores, not args.no_interpolate)
+    except FileNotFoundError:
+        parser.error(f"no solved table at {args.source}; run multisim.py (or another solver) first")
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Play STRAT({x}); win probability {p:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,16 @@ import sys
 import json
 import argparse
 import os
+import time
+import numpy as np
 from tqdm import tqdm
 
+import instrument
+import store
+from cards import (deck_cards, encode_card, decode_card, MODIFIER_CARDS, CODE_TO_CARD, CARD_TO_CODE,
+                   X2_CODE, SC_CODE, NUM_CARD_CODES, MODIFIER_VALUES, MAX_HAND_SIZE, FLIP_SEVEN_BONUS,
+                   DECK_COUNTS)
+
 # -----------------------------------------------------------------------------
 # Constants and Path Helpers
 # -----------------------------------------------------------------------------
@@ -14,7 +22,22 @@ DATA_DIR = "data"
 
 def get_sim_path(x):
     """
-    Returns the standard path for simulation results for strategy X.
+    Returns the standard path for simulation results for strategy X
+    (a columnar store directory, see store.py).
+    """
+    return os.path.join(DATA_DIR, f"sim_results_{x}")
+
+
+def get_instrumentation_path(x):
+    """
+    Returns the path of the instrumentation report of `sim.py X n --instrument`.
+    """
+    return os.path.join(DATA_DIR, f"sim_instrumentation_{x}.json")
+
+
+def get_legacy_sim_path(x):
+    """
+    Returns the path of the old one-JSON-object-per-hand results file.
     """
     return os.path.join(DATA_DIR, f"sim_results_{x}.jsonl")
 
@@ -28,75 +51,188 @@ def create_deck():
     """
     Creates and returns a shuffled deck of Flip7 cards.
     """
-    deck = []
+    deck = deck_cards()
+    random.shuffle(deck)
+    return deck
 
-    # Number cards: denomination n has count n, except 0 has count 1.
-    # 0: 1
-    # 1: 1
-    # 2: 2
-    # ...
-    # 12: 12
-    deck.append(0)
-    for i in range(1, 13):
-        deck.extend([i] * i)
 
-    # Modifier cards
-    # +2, +4, +6, +8, +10 (one of each)
-    deck.extend(["+2", "+4", "+6", "+8", "+10"])
+# Codes by decreasing count, so a weighted draw usually stops early
+_DRAW_ORDER = sorted(range(NUM_CARD_CODES), key=lambda code: -DECK_COUNTS[code])
 
-    # Double card: x2 (one)
-    deck.append("x2")
 
-    # Second Chance cards: 3 instances
-    deck.extend(["SC"] * 3)
+class Deck:
+    """
+    A deck as the remaining count of each card code.  Drawing picks a card
+    weighted by count and decrements it, which is O(draws) work per hand
+    instead of shuffling the whole deck up front.
 
-    random.shuffle(deck)
-    return deck
+    A Deck is consumed in place, so passing the same one to successive
+    play_hand calls plays from a deck that is not reshuffled between hands.
+    """
 
+    __slots__ = ("counts", "remaining")
+
+    def __init__(self, counts=DECK_COUNTS):
+        self.counts = list(counts)
+        self.remaining = sum(self.counts)
+
+    @classmethod
+    def from_cards(cls, cards):
+        """Returns a Deck holding exactly the given create_deck() cards."""
+        counts = [0] * NUM_CARD_CODES
+        for card in cards:
+            counts[CARD_TO_CODE[card]] += 1
+        return cls(counts)
+
+    def __len__(self):
+        return self.remaining
+
+    def remove(self, card):
+        """Takes a specific create_deck() card out of the deck."""
+        code = CARD_TO_CODE[card]
+        if not self.counts[code]:
+            raise ValueError(f"no {card!r} left in the deck")
+        self.counts[code] -= 1
+        self.remaining -= 1
+
+    def draw(self):
+        """Draws a uniformly random remaining card and returns its code."""
+        r = random.randrange(self.remaining)
+        counts = self.counts
+        for code in _DRAW_ORDER:
+            r -= counts[code]
+            if r < 0:
+                counts[code] -= 1
+                self.remaining -= 1
+                return code
 
-def calculate_score(hand, is_bust=False):
-    """
-    Calculates the score of a hand according to Flip7 rules.
-    If is_bust is True, score is 0.
-    """
-    if is_bust:
-        return 0
 
-    # Separate cards
-    numbers = []
-    modifiers = []
-    has_doubler = False
+# -----------------------------------------------------------------------------
+# Hand State
+# -----------------------------------------------------------------------------
 
-    for card in hand:
-        if isinstance(card, int):
-            numbers.append(card)
-        elif card == "x2":
-            has_doubler = True
-        elif isinstance(card, str) and card.startswith("+"):
-            modifiers.append(int(card[1:]))
-        # SC cards have no point value and stick around until used/end
 
-    # 1. Total points from number cards
-    # Check for bust (internal integrity check, though sim handles bust state)
-    # The rule says: "The player busts if they have any two cards of the same denomination"
-    # We assume the passed hand is valid (not busted) unless is_bust flag is True.
+class HandState:
+    """
+    A hand as running totals over integer card codes, so that duplicate
+    checks, adding a card and scoring are all O(1).
 
-    base_sum = sum(numbers)
+    number_mask has bit n set for each number card n held; codes keeps the
+    held cards in order for the dict output of run_simulation.
+    """
 
-    # 2. Apply Double
-    score = base_sum
-    if has_doubler:
-        score *= 2
+    __slots__ = ("number_mask", "number_sum", "modifier_sum", "has_x2", "has_sc",
+                 "n_cards", "is_bust", "codes")
+
+    def __init__(self):
+        self.number_mask = 0
+        self.number_sum = 0
+        self.modifier_sum = 0
+        self.has_x2 = False
+        self.has_sc = False
+        self.n_cards = 0
+        self.is_bust = False
+        self.codes = []
+
+    @classmethod
+    def from_cards(cls, hand):
+        """
+        Builds a HandState holding exactly the given create_deck() cards,
+        without applying the draw rules (see add).
+        """
+        state = cls()
+        for card in hand:
+            code = CARD_TO_CODE[card]
+            if code < 13:
+                state.number_mask |= 1 << code
+                state.number_sum += code
+            elif code == X2_CODE:
+                state.has_x2 = True
+            elif code == SC_CODE:
+                state.has_sc = True
+            else:
+                state.modifier_sum += MODIFIER_VALUES[code]
+            state.codes.append(code)
+        state.n_cards = len(state.codes)
+        return state
+
+    def holds_number(self, code):
+        """Returns True if number card code is already in the hand."""
+        return bool(self.number_mask >> code & 1)
+
+    def add(self, code):
+        """
+        Applies one drawn card with the Flip7 rules:
+        - A second SC is discarded immediately (the held one is kept).
+        - A duplicate number is saved by a held SC ("Discard both the Second
+          Chance card and the duplicate number card"), otherwise it busts
+          the hand (and is kept, to capture the bust state in the record).
+        """
+        if code < 13:
+            if self.number_mask >> code & 1:
+                if self.has_sc:
+                    self.has_sc = False
+                    self.codes.remove(SC_CODE)
+                    self.n_cards -= 1
+                    return
+                self.is_bust = True
+            self.number_mask |= 1 << code
+            self.number_sum += code
+        elif code == SC_CODE:
+            if self.has_sc:
+                return
+            self.has_sc = True
+        elif code == X2_CODE:
+            self.has_x2 = True
+        else:
+            self.modifier_sum += MODIFIER_VALUES[code]
+        self.codes.append(code)
+        self.n_cards += 1
+
+    def score(self):
+        """
+        Returns the score of the hand: 0 if busted, else the number cards
+        (doubled by x2), plus the +N modifiers, plus the Flip 7 bonus for
+        seven cards.
+        """
+        if self.is_bust:
+            return 0
+        score = self.number_sum * 2 if self.has_x2 else self.number_sum
+        score += self.modifier_sum
+        if self.n_cards == MAX_HAND_SIZE:
+            score += FLIP_SEVEN_BONUS
+        return score
+
+    def is_flip_seven(self):
+        """Returns True if the hand earned the Flip 7 bonus."""
+        return self.n_cards == MAX_HAND_SIZE and not self.is_bust
+
+    def cards(self):
+        """Returns the held cards as create_deck() cards."""
+        return [CODE_TO_CARD[code] for code in self.codes]
+
+    def to_dict(self):
+        """Returns the run_simulation outcome dict for this (finished) hand."""
+        return {
+            "cards": self.cards(),
+            "is_bust": self.is_bust,
+            "total_value": self.score(),
+            "is_flip_seven_bonus": self.is_flip_seven(),
+        }
 
-    # 3. Add point modifiers
-    score += sum(modifiers)
 
-    # 4. Flip 7 Bonus
-    # "If the hand contains seven cards and is not busted... 15 points"
-    if len(hand) == 7:
-        score += 15
+def calculate_score(hand, is_bust=False):
+    """
+    Calculates the score of a hand according to Flip7 rules.
+    If is_bust is True, score is 0.
 
-    return score
+    hand may be a list of create_deck() cards or a HandState.
+    """
+    if is_bust:
+        return 0
+    if not isinstance(hand, HandState):
+        hand = HandState.from_cards(hand)
+    return hand.score()
 
 
 # -----------------------------------------------------------------------------
@@ -104,77 +240,68 @@ def calculate_score(hand, is_bust=False):
 # -----------------------------------------------------------------------------
 
 
-def run_simulation(strategy_x):
+def play_hand(strategy_x, deck=None):
     """
-    Runs a single simulation of Flip7 with strategy:
+    Plays a single hand of Flip7 with strategy:
     "Hit until score >= strategy_x"
     Exception: If holding a Second Chance card, always hit (never stand).
 
-    Returns a dictionary with the outcome.
-    """
-    deck = create_deck()
-    hand = []
-    has_sc = False
-    is_bust = False
+    deck is a Deck to draw from (a fresh full one by default), or a
+    shuffled card list from create_deck() to pop cards from.
 
-    while True:
-        # Check end conditions
-
-        # 1. Max cards
-        if len(hand) >= 7:
-            break
-
-        current_score = calculate_score(hand)
-
-        # 2. Strategy Check
+    Returns the final HandState.
+    """
+    if deck is None:
+        deck = Deck()
+    if isinstance(deck, Deck):
+        draw = deck.draw
+    else:
+        def draw():
+            return CARD_TO_CODE[deck.pop()]
+    hand = HandState()
+
+    while hand.n_cards < MAX_HAND_SIZE:
         # Stand if score >= X, UNLESS we have a Second Chance card.
         # "One can infer that nobody would ever stand if they have a second chance card."
-        if current_score >= strategy_x and not has_sc:
+        if not hand.has_sc and hand.score() >= strategy_x:
             break
 
-        # Draw a card
         if not deck:
             break  # Should not happen in normal play
 
-        card = deck.pop()
+        hand.add(draw())
+        if hand.is_bust:
+            break
 
-        if card == "SC":
-            if has_sc:
-                # Discard the new SC immediately (keep the old one)
-                pass
-            else:
-                has_sc = True
-                hand.append(card)
-
-        elif isinstance(card, int):
-            if card in hand:
-                if has_sc:
-                    # Saved by Second Chance!
-                    # "Discard both the Second Chance card and the duplicate number card."
-                    has_sc = False
-                    hand.remove("SC")
-                    # The new card 'card' is effectively discarded (not added to hand)
-                else:
-                    # Bust!
-                    hand.append(card)  # Add it to capture the bust state in the record
-                    is_bust = True
-                    break
-            else:
-                hand.append(card)
+    return hand
 
-        else:
-            # Modifier or x2
-            hand.append(card)
 
-    final_score = calculate_score(hand, is_bust)
-    is_flip_seven = len(hand) == 7 and not is_bust
+def run_simulation(strategy_x, deck=None):
+    """
+    Runs a single simulation of Flip7 with strategy:
+    "Hit until score >= strategy_x"
+    Exception: If holding a Second Chance card, always hit (never stand).
+
+    Draws from a fresh Deck unless given one (see play_hand).
 
-    return {
-        "cards": hand,
-        "is_bust": is_bust,
-        "total_value": final_score,
-        "is_flip_seven_bonus": is_flip_seven,
-    }
+    Returns a dictionary with the outcome.
+    """
+    return play_hand(strategy_x, deck).to_dict()
+
+
+def play_hand_timed(strategy_x):
+    """
+    play_hand from a fresh Deck, with the deck creation and the play of the
+    hand timed separately (see instrument.py).
+    """
+    start = time.perf_counter()
+    deck = Deck()
+    dealt = time.perf_counter()
+    hand = play_hand(strategy_x, deck)
+    instrument.add_time("deck", dealt - start)
+    instrument.add_time("hand", time.perf_counter() - dealt)
+    instrument.count("hands")
+    return hand
 
 
 # -----------------------------------------------------------------------------
@@ -182,22 +309,53 @@ def run_simulation(strategy_x):
 # -----------------------------------------------------------------------------
 
 
-def save_simulations(results, x):
+def records_to_columns(records):
     """
-    Appends simulation results to a JSONL file.
+    Converts run_simulation-style dicts into columnar results.
     """
-    os.makedirs(DATA_DIR, exist_ok=True)
-    filename = get_sim_path(x)
-    with open(filename, "a") as f:
-        for res in results:
-            f.write(json.dumps(res) + "\n")
+    n = len(records)
+    cards = np.full((n, MAX_HAND_SIZE), -1, dtype=np.int8)
+    for i, res in enumerate(records):
+        cards[i, :len(res["cards"])] = [encode_card(c) for c in res["cards"]]
+    return {
+        "total_value": np.array([res["total_value"] for res in records], dtype=np.int16),
+        "is_bust": np.array([res["is_bust"] for res in records], dtype=bool),
+        "is_flip_seven_bonus": np.array([res["is_flip_seven_bonus"] for res in records], dtype=bool),
+        "cards": cards,
+    }
+
 
+RECORD_CHUNK_SIZE = 65536
 
-def read_simulations(x):
+
+def columns_to_records(columns, chunk_size=RECORD_CHUNK_SIZE):
+    """
+    Yields run_simulation-style dicts from columnar results.
+    """
+    # Each chunk is converted to Python lists first: indexing the (memory
+    # mapped) arrays one NumPy scalar at a time is several times slower
+    n = len(columns["total_value"])
+    for start in range(0, n, chunk_size):
+        rows = slice(start, start + chunk_size)
+        for cards, is_bust, total_value, is_flip_seven_bonus in zip(
+            columns["cards"][rows].tolist(),
+            columns["is_bust"][rows].tolist(),
+            columns["total_value"][rows].tolist(),
+            columns["is_flip_seven_bonus"][rows].tolist(),
+        ):
+            yield {
+                "cards": [CODE_TO_CARD[c] for c in cards if c >= 0],
+                "is_bust": is_bust,
+                "total_value": total_value,
+                "is_flip_seven_bonus": is_flip_seven_bonus,
+            }
+
+
+def _read_legacy(x):
     """
-    Yields simulation results from a JSONL file.
+    Yields simulation results from an old-style JSONL file.
     """
-    filename = get_sim_path(x)
+    filename = get_legacy_sim_path(x)
     if not os.path.exists(filename):
         return
 
@@ -207,22 +365,340 @@ def read_simulations(x):
                 yield json.loads(line)
 
 
+def convert_jsonl(x, chunk_size=100000):
+    """
+    Moves an old-style JSONL results file for strategy X into the columnar
+    store.  The JSONL file is kept, renamed to *.jsonl.converted.
+
+    Returns the number of hands converted.
+    """
+    filename = get_legacy_sim_path(x)
+    if not os.path.exists(filename):
+        return 0
+
+    converted = 0
+    chunk = []
+    for res in _read_legacy(x):
+        chunk.append(res)
+        if len(chunk) >= chunk_size:
+            store.append(get_sim_path(x), records_to_columns(chunk))
+            converted += len(chunk)
+            chunk = []
+    if chunk or converted == 0:
+        store.append(get_sim_path(x), records_to_columns(chunk))
+        converted += len(chunk)
+
+    os.replace(filename, filename + ".converted")
+    return converted
+
+
+def save_simulations(results, x):
+    """
+    Appends simulation results to the columnar store for strategy X.
+    results may be a list of run_simulation dicts or columnar results
+    (e.g. from batch_sim.run_simulations_batch).
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if os.path.exists(get_legacy_sim_path(x)):
+        convert_jsonl(x)
+    if not isinstance(results, dict):
+        results = records_to_columns(list(results))
+    store.append(get_sim_path(x), results)
+
+
+WRITE_CHUNK_SIZE = 100000
+
+
+def open_writer(x, chunk_size=WRITE_CHUNK_SIZE):
+    """
+    Returns a store.Writer that streams results for strategy X to its
+    store in chunks of chunk_size hands (converting an old JSONL file
+    first, as save_simulations does).
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if os.path.exists(get_legacy_sim_path(x)):
+        convert_jsonl(x)
+    return store.Writer(get_sim_path(x), chunk_size)
+
+
+def _iter_simulations(x):
+    if store.exists(get_sim_path(x)):
+        yield from columns_to_records(store.read(get_sim_path(x)))
+    yield from _read_legacy(x)
+
+
+def read_simulations(x, columns=None):
+    """
+    Reads simulation results for strategy X.
+
+    Without columns, yields run_simulation-style dicts (the original
+    behaviour).  With a list of column names (see store.COLUMNS), returns
+    {name: array}; from the columnar store these are zero-copy memory-mapped
+    views, so e.g. columns=["total_value"] never touches the cards.
+    """
+    if columns is None:
+        return _iter_simulations(x)
+
+    parts = []
+    if store.exists(get_sim_path(x)):
+        parts.append(store.read(get_sim_path(x), columns))
+    if os.path.exists(get_legacy_sim_path(x)):
+        legacy = records_to_columns(list(_read_legacy(x)))
+        parts.append({name: legacy[name] for name in columns})
+    if not parts:
+        parts.append(store.read(get_sim_path(x), columns))
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([part[name] for part in parts]) for name in columns}
+
+
+AGGREGATE_CHUNK_SIZE = 1000000
+
+
+def load_aggregate(x):
+    """
+    Returns a ScoreAggregator (see aggregate.py) over all results for
+    strategy X, or None if there are none.
+
+    Uses the store's summary sidecar when it is up to date; otherwise
+    rescans the results in chunks (constant memory) and refreshes it.
+    """
+    path = get_sim_path(x)
+    has_legacy = os.path.exists(get_legacy_sim_path(x))
+    if not has_legacy:
+        aggregator = store.read_summary(path)
+        if aggregator is not None:
+            return aggregator if aggregator.count else None
+
+    aggregator = store.aggregate(path, AGGREGATE_CHUNK_SIZE)
+    if store.exists(path) and not has_legacy:
+        store.write_summary(path, aggregator)
+
+    chunk = []
+    for res in _read_legacy(x):
+        chunk.append(res)
+        if len(chunk) == AGGREGATE_CHUNK_SIZE:
+            aggregator.update_columns(records_to_columns(chunk))
+            chunk = []
+    if chunk:
+        aggregator.update_columns(records_to_columns(chunk))
+    return aggregator if aggregator.count else None
+
+
+def parse_x_values(spec):
+    """
+    Parses a strategy list such as "1..100", "0..100:5" or "10,20,30".
+    """
+    values = []
+    for part in spec.split(","):
+        if ".." in part:
+            bounds, _, step = part.partition(":")
+            lo, hi = bounds.split("..")
+            values.extend(range(int(lo), int(hi) + 1, int(step or 1)))
+        else:
+            values.append(int(part))
+    return sorted(set(values))
+
+
+SHARED_CHUNK_SIZE = 10000
+
+
+def main_shared(argv):
+    """
+    `python sim.py shared --x 1..100 --n 10000`: plays each shuffled deck
+    once and records the outcome of every STRAT(X) on it, so all X values
+    share the same decks.
+    """
+    from batch_sim import run_all_thresholds_batch, threshold_slice
+
+    parser = argparse.ArgumentParser(
+        prog="sim.py shared",
+        description="Run Flip7 simulations for many X values on shared decks",
+    )
+    parser.add_argument("--x", type=parse_x_values, default=parse_x_values("1..100"),
+                        help='Strategy thresholds, e.g. "1..100" or "0..100:5"')
+    parser.add_argument("--n", type=int, required=True, help="Number of decks to play")
+    args = parser.parse_args(argv)
+
+    with tqdm(total=args.n, desc=f"Shared decks, {len(args.x)} strategies") as progress:
+        for start in range(0, args.n, SHARED_CHUNK_SIZE):
+            size = min(SHARED_CHUNK_SIZE, args.n - start)
+            batch = run_all_thresholds_batch(args.x, size)
+            for i, x in enumerate(batch["x_values"]):
+                save_simulations(threshold_slice(batch, i), int(x))
+            progress.update(size)
+
+    print(
+        f"Ran {args.n} shared decks for {len(args.x)} strategies. Results appended to {DATA_DIR}/"
+    )
+
+
+SWEEP_CHUNK_SIZE = 10000
+
+
+def _sweep_job(job):
+    """
+    Worker for `sim.py sweep`: plays one chunk of hands for one X with the
+    job's own seeded RNG stream and returns (x, columnar results).
+    """
+    from batch_sim import run_simulations_batch
+
+    x, size, seed_seq = job
+    return x, run_simulations_batch(x, size, rng=np.random.default_rng(seed_seq))
+
+
+def main_sweep(argv):
+    """
+    `python sim.py sweep --x 1..100 --n 10000 --workers N`: runs n hands for
+    every X on a process pool.  Every chunk of hands gets an independent
+    child of one SeedSequence, and only the parent process writes results,
+    so each X's file is appended to by one writer.
+    """
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(
+        prog="sim.py sweep",
+        description="Run Flip7 simulations for many X values on a process pool",
+    )
+    parser.add_argument("--x", type=parse_x_values, default=parse_x_values("1..100"),
+                        help='Strategy thresholds, e.g. "1..100" or "0..100:5"')
+    parser.add_argument("--n", type=int, required=True, help="Number of simulations per X")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Root seed; omit for a fresh one (printed for reproducibility)")
+    args = parser.parse_args(argv)
+
+    root = np.random.SeedSequence(args.seed)
+    print(f"Sweep seed: {root.entropy}")
+
+    sizes = [min(SWEEP_CHUNK_SIZE, args.n - start) for start in range(0, args.n, SWEEP_CHUNK_SIZE)]
+    jobs = [(x, size) for x in args.x for size in sizes]
+    jobs = [(x, size, seed_seq) for (x, size), seed_seq in zip(jobs, root.spawn(len(jobs)))]
+
+    with tqdm(total=args.n * len(args.x), desc=f"Sweep, {len(args.x)} strategies", unit="hand") as progress:
+        if args.workers > 1:
+            with multiprocessing.Pool(args.workers) as pool:
+                for x, batch in pool.imap_unordered(_sweep_job, jobs):
+                    save_simulations(batch, x)
+                    progress.update(len(batch["total_value"]))
+        else:
+            for x, batch in map(_sweep_job, jobs):
+                save_simulations(batch, x)
+                progress.update(len(batch["total_value"]))
+
+    print(f"Ran {args.n} simulations for each of {len(args.x)} strategies. Results appended to {DATA_DIR}/")
+
+
+def main_convert(argv):
+    """
+    `python sim.py convert [--x ...]`: moves old JSONL results files into
+    the columnar store.
+    """
+    parser = argparse.ArgumentParser(
+        prog="sim.py convert",
+        description="Convert sim_results_X.jsonl files to the columnar store",
+    )
+    parser.add_argument("--x", type=parse_x_values, default=None,
+                        help="Strategies to convert (default: every JSONL file in data/)")
+    args = parser.parse_args(argv)
+
+    xs = args.x
+    if xs is None:
+        xs = []
+        if os.path.exists(DATA_DIR):
+            for filename in os.listdir(DATA_DIR):
+                if filename.startswith("sim_results_") and filename.endswith(".jsonl"):
+                    xs.append(int(filename[len("sim_results_"):-len(".jsonl")]))
+    for x in sorted(xs):
+        n = convert_jsonl(x)
+        print(f"X={x}: converted {n} hands to {get_sim_path(x)}")
+
+
+INSTRUMENT_SAMPLE_INTERVAL = 10000
+
+
+def simulate_to_store(x, n, batch=False):
+    """
+    Plays n hands of STRAT(x) and appends them to its store.  Results are
+    streamed to disk in chunks, so memory does not grow with n and an
+    interrupted run keeps every chunk written before it stopped.
+    """
+    with open_writer(x) as writer:
+        if batch:
+            from batch_sim import run_simulations_batch
+
+            with tqdm(total=n, desc=f"Strategy X={x}", unit="hand") as progress:
+                for start in range(0, n, WRITE_CHUNK_SIZE):
+                    size = min(WRITE_CHUNK_SIZE, n - start)
+                    if not instrument.enabled:
+                        writer.extend(run_simulations_batch(x, size))
+                    else:
+                        with instrument.timer("hand"):
+                            results = run_simulations_batch(x, size)
+                        with instrument.timer("io"):
+                            writer.extend(results)
+                        instrument.count("hands", size)
+                        instrument.sample()
+                    progress.update(size)
+        else:
+            for i in tqdm(range(n), desc=f"Strategy X={x}"):
+                if not instrument.enabled:
+                    hand = play_hand(x)
+                    writer.add(hand.score(), hand.is_bust, hand.is_flip_seven(), hand.codes)
+                    continue
+                hand = play_hand_timed(x)
+                with instrument.timer("score"):
+                    score = hand.score()
+                with instrument.timer("io"):
+                    writer.add(score, hand.is_bust, hand.is_flip_seven(), hand.codes)
+                if (i + 1) % INSTRUMENT_SAMPLE_INTERVAL == 0:
+                    instrument.sample()
+
+        if instrument.enabled:
+            with instrument.timer("io"):
+                writer.flush()
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "convert":
+        main_convert(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "shared":
+        main_shared(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "sweep":
+        main_sweep(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(description="Run Flip7 Simulations")
     parser.add_argument(
         "X", type=int, help="Target score threshold to stand (Strategy X)"
     )
     parser.add_argument("n", type=int, help="Number of simulations to run")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Use the vectorized NumPy engine (batch_sim.py)",
+    )
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help=f"Time the simulation phases and write a report to {get_instrumentation_path('X')}",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Like --instrument, and also run under cProfile with the stats dumped next to the report",
+    )
 
     args = parser.parse_args()
 
-    results = []
-    # Optimization: Write in chunks if n is huge, but list is fine for reasonable n
-    for _ in tqdm(range(args.n), desc=f"Strategy X={args.X}"):
-        res = run_simulation(args.X)
-        results.append(res)
+    report_path = get_instrumentation_path(args.X) if args.instrument or args.profile else None
+    profile_path = report_path[:-len(".json")] + ".prof" if args.profile else None
+    with instrument.session(report_path, profile_path, strategy_x=args.X, n=args.n, batch=args.batch):
+        simulate_to_store(args.X, args.n, args.batch)
 
-    save_simulations(results, args.X)
     print(
         f"Ran {args.n} simulations with Strategy X={args.X}. Results appended to {get_sim_path(args.X)}"
     )
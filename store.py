@@ -0,0 +1,260 @@
+"""
+store.py - Columnar binary storage for simulation results.
+
+A result store is a directory holding one raw little-endian file per column
+plus a schema.json describing them:
+
+    total_value.bin          int16
+    is_bust.bin              bool (one byte per hand)
+    is_flip_seven_bonus.bin  bool (one byte per hand)
+    cards.bin                int8 x 7 card codes (see cards.encode_card), -1 padded
+
+Rows are fixed width, so appending is a plain write at the end of every
+column file, and reading is a zero-copy np.memmap of only the columns a
+caller asks for.  The row count is the number of complete rows present in
+every column, so a torn append never exposes a partial record, and the next
+append trims any such leftover bytes before writing.  Appends are fsynced,
+and Writer streams rows to disk in fixed-size chunks.
+
+Each store also keeps a small summary.json sidecar (count, sum, sum of
+squares, exact score histogram, bust and Flip 7 counts; see aggregate.py)
+that append() updates incrementally.  It records how many rows it covers, so a sidecar
+left behind by an interrupted append is detected as stale.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from aggregate import ScoreAggregator
+from cards import MAX_HAND_SIZE
+
+SCHEMA_VERSION = 1
+
+COLUMNS = {
+    "total_value": (np.dtype("<i2"), ()),
+    "is_bust": (np.dtype("?"), ()),
+    "is_flip_seven_bonus": (np.dtype("?"), ()),
+    "cards": (np.dtype("i1"), (MAX_HAND_SIZE,)),
+}
+
+
+def _column_file(path, name):
+    return os.path.join(path, f"{name}.bin")
+
+
+def _row_bytes(name):
+    dtype, shape = COLUMNS[name]
+    return dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+
+
+def exists(path):
+    """
+    Returns True if path holds a result store.
+    """
+    return os.path.exists(os.path.join(path, "schema.json"))
+
+
+def _ensure(path):
+    """
+    Creates an empty store at path if there is none, else checks its schema.
+    """
+    schema_path = os.path.join(path, "schema.json")
+    if os.path.exists(schema_path):
+        with open(schema_path, "r") as f:
+            schema = json.load(f)
+        if schema["version"] != SCHEMA_VERSION:
+            raise ValueError(f"{path}: unsupported store version {schema['version']}")
+        return
+
+    os.makedirs(path, exist_ok=True)
+    schema = {
+        "version": SCHEMA_VERSION,
+        "columns": {
+            name: {"dtype": dtype.str, "shape": list(shape)}
+            for name, (dtype, shape) in COLUMNS.items()
+        },
+    }
+    tmp_path = schema_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(schema, f, indent=2)
+    os.replace(tmp_path, schema_path)
+
+
+def count_rows(path):
+    """
+    Returns the number of complete rows in the store at path.
+    """
+    if not exists(path):
+        return 0
+    rows = []
+    for name in COLUMNS:
+        filename = _column_file(path, name)
+        size = os.path.getsize(filename) if os.path.exists(filename) else 0
+        rows.append(size // _row_bytes(name))
+    return min(rows)
+
+
+def _trim(path):
+    """
+    Truncates every column file to the store's complete row count, dropping
+    whatever an interrupted append left past it.
+    """
+    n = count_rows(path)
+    for name in COLUMNS:
+        filename = _column_file(path, name)
+        if os.path.exists(filename) and os.path.getsize(filename) > n * _row_bytes(name):
+            os.truncate(filename, n * _row_bytes(name))
+
+
+def append(path, columns):
+    """
+    Appends columnar results (a dict with every column in COLUMNS) to the
+    store at path, creating it if needed, and updates its summary sidecar.
+    The column files are fsynced before the sidecar is written.
+    """
+    _ensure(path)
+    _trim(path)
+    summary = read_summary(path)
+    n = len(columns["total_value"])
+    data = {}
+    for name, (dtype, shape) in COLUMNS.items():
+        data[name] = np.ascontiguousarray(columns[name], dtype=dtype)
+        if data[name].shape != (n,) + shape:
+            raise ValueError(f"column {name} has shape {data[name].shape}, expected {(n,) + shape}")
+    for name in COLUMNS:
+        with open(_column_file(path, name), "ab") as f:
+            f.write(data[name].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    if summary is None:
+        summary = aggregate(path)
+    else:
+        summary.update_columns(data)
+    write_summary(path, summary)
+
+
+def read(path, columns=None):
+    """
+    Returns {name: array} for the requested columns (all by default).
+
+    The arrays are read-only memory-mapped views of the column files, so
+    projecting a single column touches no other data.
+    """
+    if columns is None:
+        columns = list(COLUMNS)
+    n = count_rows(path)
+    result = {}
+    for name in columns:
+        dtype, shape = COLUMNS[name]
+        if n == 0:
+            result[name] = np.zeros((0,) + shape, dtype=dtype)
+        else:
+            result[name] = np.memmap(_column_file(path, name), dtype=dtype, mode="r", shape=(n,) + shape)
+    return result
+
+
+class Writer:
+    """
+    Streams rows into the store at path with constant memory: rows are
+    buffered in preallocated column arrays and appended (and fsynced) every
+    chunk_size rows, and on close.
+
+        with store.Writer(path) as writer:
+            writer.add(total_value, is_bust, is_flip_seven_bonus, cards)
+    """
+
+    def __init__(self, path, chunk_size=100000):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self.written = 0
+        self._buffer = {
+            name: np.empty((chunk_size,) + shape, dtype=dtype)
+            for name, (dtype, shape) in COLUMNS.items()
+        }
+        self._buffer["cards"].fill(-1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, total_value, is_bust, is_flip_seven_bonus, cards):
+        """Buffers one hand; cards is a sequence of card codes in hand order."""
+        i = self.rows
+        self._buffer["total_value"][i] = total_value
+        self._buffer["is_bust"][i] = is_bust
+        self._buffer["is_flip_seven_bonus"][i] = is_flip_seven_bonus
+        self._buffer["cards"][i, :len(cards)] = cards
+        self.rows += 1
+        if self.rows == self.chunk_size:
+            self.flush()
+
+    def extend(self, columns):
+        """Writes columnar results, after any buffered rows."""
+        self.flush()
+        n = len(columns["total_value"])
+        for start in range(0, n, self.chunk_size):
+            append(self.path, {name: columns[name][start:start + self.chunk_size] for name in COLUMNS})
+        self.written += n
+
+    def flush(self):
+        """Appends the buffered rows to the store."""
+        if self.rows:
+            append(self.path, {name: buffer[:self.rows] for name, buffer in self._buffer.items()})
+            self.written += self.rows
+            self.rows = 0
+            self._buffer["cards"].fill(-1)
+
+    def close(self):
+        self.flush()
+
+
+# -----------------------------------------------------------------------------
+# Summary sidecar
+# -----------------------------------------------------------------------------
+
+
+def aggregate(path, chunk_size=1000000):
+    """
+    Returns a ScoreAggregator over every row of the store at path, reading
+    the memory-mapped columns chunk by chunk.
+    """
+    columns = read(path, ["total_value", "is_bust", "is_flip_seven_bonus"])
+    aggregator = ScoreAggregator()
+    for start in range(0, len(columns["total_value"]), chunk_size):
+        aggregator.update_columns({name: col[start:start + chunk_size] for name, col in columns.items()})
+    return aggregator
+
+
+def read_summary(path):
+    """
+    Returns the summary sidecar of the store at path as a ScoreAggregator,
+    or None if it is missing or does not cover exactly the rows in the store.
+    """
+    summary_path = os.path.join(path, "summary.json")
+    if not os.path.exists(summary_path):
+        return None
+    try:
+        with open(summary_path, "r") as f:
+            summary = json.load(f)
+    except ValueError:
+        return None
+    if summary.get("version") != SCHEMA_VERSION or summary.get("count") != count_rows(path):
+        return None
+    return ScoreAggregator.from_summary(summary)
+
+
+def write_summary(path, aggregator):
+    """
+    Atomically replaces the summary sidecar of the store at path.
+    """
+    summary_path = os.path.join(path, "summary.json")
+    tmp_path = summary_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(dict(aggregator.to_summary(), version=SCHEMA_VERSION), f)
+    os.replace(tmp_path, summary_path)
@@ -0,0 +1,66 @@
+"""
+Seeded statistical checks of the simulation engines against the exact
+score distributions of exact.py.
+
+Each engine's empirical score histogram is compared with the exact PMF:
+no hand may reach a score the exact solver rules out, and the count of
+every score likely enough to be well approximated by a normal (and the
+mean score) must lie within MAX_Z standard errors of its expectation.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from batch_sim import run_simulations_batch, run_all_thresholds_batch, threshold_slice
+from exact import score_pmf_array
+from sim import play_hand
+
+X_VALUES = [1, 15, 25, 40, 60]
+MAX_Z = 4.5
+MIN_EXPECTED = 20  # Scores expected fewer times are only checked for impossibility
+
+
+def assert_matches_pmf(scores, pmf):
+    scores = np.asarray(scores, dtype=np.int64)
+    n = len(scores)
+    counts = np.bincount(scores, minlength=len(pmf))
+    assert len(counts) == len(pmf), f"score {len(counts) - 1} is above the exact maximum {len(pmf) - 1}"
+    impossible = np.flatnonzero((pmf == 0) & (counts > 0))
+    assert not len(impossible), f"scores {impossible.tolist()} have probability 0"
+
+    expected = n * pmf
+    checked = expected >= MIN_EXPECTED
+    z = (counts[checked] - expected[checked]) / np.sqrt(expected[checked] * (1 - pmf[checked]))
+    worst = np.argmax(np.abs(z))
+    assert abs(z[worst]) < MAX_Z, (
+        f"score {np.flatnonzero(checked)[worst]}: {counts[checked][worst]} hands, "
+        f"expected {expected[checked][worst]:.1f} (z = {z[worst]:.2f})"
+    )
+
+    support = np.arange(len(pmf))
+    mean = support @ pmf
+    std = np.sqrt((support - mean) ** 2 @ pmf)
+    z_mean = (scores.mean() - mean) / (std / np.sqrt(n))
+    assert abs(z_mean) < MAX_Z, f"mean score {scores.mean():.3f}, expected {mean:.3f} (z = {z_mean:.2f})"
+
+
+@pytest.mark.parametrize("x", X_VALUES)
+def test_batch_engine_matches_exact(x):
+    results = run_simulations_batch(x, 200000, np.random.default_rng(x), with_cards=False)
+    assert_matches_pmf(results["total_value"], score_pmf_array(x))
+
+
+def test_shared_deck_engine_matches_exact():
+    # Every threshold is played on the same decks, so each must match on its own
+    batch = run_all_thresholds_batch(X_VALUES, 200000, np.random.default_rng(0), with_cards=False)
+    for i, x in enumerate(batch["x_values"]):
+        assert_matches_pmf(threshold_slice(batch, i)["total_value"], score_pmf_array(int(x)))
+
+
+@pytest.mark.parametrize("x", X_VALUES)
+def test_deck_engine_matches_exact(x):
+    # sim.Deck draws from the random module's global generator
+    random.seed(x)
+    assert_matches_pmf([play_hand(x).score() for _ in range(100000)], score_pmf_array(x))
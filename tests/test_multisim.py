@@ -0,0 +1,43 @@
+"""
+Tests of multisim's checkpointing.
+"""
+
+import pytest
+
+import multisim
+
+
+def _grid():
+    states = [(p1, p2) for p1 in multisim.SCORE_STEPS for p2 in multisim.SCORE_STEPS]
+    return {state: 25 for state in states}, {state: 0.5 for state in states}
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    parameters = multisim.run_parameters("crn", 7)
+    optimal_strategies, win_probs = _grid()
+    diagnostics = {(0, 0): {"se": 0.01}}
+    multisim.save_checkpoint(path, parameters, optimal_strategies, win_probs, diagnostics)
+
+    assert multisim.load_checkpoint(path, parameters) == (optimal_strategies, win_probs, diagnostics)
+
+
+@pytest.mark.parametrize("method, seed, mismatched", [("sampled", 7, "method"), ("crn", 8, "seed")])
+def test_checkpoint_with_other_parameters_is_refused(tmp_path, method, seed, mismatched):
+    path = str(tmp_path / "checkpoint.json")
+    multisim.save_checkpoint(path, multisim.run_parameters("crn", 7), *_grid(), None)
+
+    with pytest.raises(ValueError, match=mismatched):
+        multisim.load_checkpoint(path, multisim.run_parameters(method, seed))
+    with pytest.raises(ValueError, match=mismatched):
+        multisim.compute_optimal_strategies(method, seed=seed, checkpoint=path, resume=True)
+
+
+def test_resume_keeps_completed_states(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    optimal_strategies, win_probs = _grid()
+    multisim.save_checkpoint(path, multisim.run_parameters("sampled", 7), optimal_strategies, win_probs, None)
+
+    # Every state is in the checkpoint, so nothing is simulated again
+    assert multisim.compute_optimal_strategies("sampled", seed=7, checkpoint=path, resume=True) == \
+        (optimal_strategies, win_probs)
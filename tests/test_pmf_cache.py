@@ -0,0 +1,66 @@
+"""
+Tests of the persistent PMF cache.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import pmf_cache
+from sim import DECK_COUNTS
+
+X_VALUES = [10, 20, 30, 40, 50]
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(pmf_cache, "CACHE_DIR", str(tmp_path / "pmf_cache"))
+    monkeypatch.setattr(pmf_cache, "_memory", {})
+    return pmf_cache.CACHE_DIR
+
+
+def _entry(x):
+    return os.path.join(pmf_cache.CACHE_DIR, f"{pmf_cache.cache_key(x, 1000)}.npy")
+
+
+def _fill(x_values):
+    """Caches a small sampled PMF per X, each entry older than the next."""
+    for i, x in enumerate(x_values):
+        pmf_cache.score_pmf(x, n_samples=1000)
+        os.utime(_entry(x), ns=(i * 10 ** 9, i * 10 ** 9))
+
+
+def test_hit_reads_the_disk_copy(cache_dir):
+    pmf = pmf_cache.score_pmf(25, n_samples=1000)
+    pmf_cache.clear_memory()
+    np.testing.assert_array_equal(pmf_cache.score_pmf(25, n_samples=1000), pmf)
+    assert [name for name in os.listdir(cache_dir) if name.endswith(".npy")] == [os.path.basename(_entry(25))]
+
+
+def test_evict_removes_the_oldest_entries(cache_dir):
+    _fill(X_VALUES)
+    pmf_cache.evict(sum(os.path.getsize(_entry(x)) for x in X_VALUES[2:]))
+    assert [os.path.exists(_entry(x)) for x in X_VALUES] == [False, False, True, True, True]
+
+
+def test_store_evicts_past_the_limit_and_hits_count_as_use(cache_dir, monkeypatch):
+    _fill(X_VALUES)
+    sizes = [os.path.getsize(_entry(x)) for x in X_VALUES]
+    os.remove(_entry(X_VALUES[4]))
+
+    # A hit refreshes the entry's mtime, so the oldest unused one goes first
+    pmf_cache.clear_memory()
+    pmf_cache.score_pmf(X_VALUES[0], n_samples=1000)
+    monkeypatch.setattr(pmf_cache, "MAX_CACHE_BYTES", sum(sizes) - sizes[1])
+    pmf_cache.score_pmf(X_VALUES[4], n_samples=1000)
+    assert [os.path.exists(_entry(x)) for x in X_VALUES] == [True, False, True, True, True]
+
+
+def test_key_depends_on_the_rules():
+    key = pmf_cache.cache_key(25)
+    assert pmf_cache.cache_key(25) == key
+    other_deck = (DECK_COUNTS[0] + 1,) + tuple(DECK_COUNTS[1:])
+    assert len({key, pmf_cache.cache_key(30), pmf_cache.cache_key(25, 1000),
+                pmf_cache.cache_key(25, deck_counts=other_deck),
+                pmf_cache.cache_key(25, flip_seven_bonus=20)}) == 5
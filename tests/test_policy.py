@@ -0,0 +1,70 @@
+"""
+Tests of policy.py lookups on a small compiled table.
+"""
+
+import io
+
+import numpy as np
+import pytest
+
+import policy
+
+# 3x3 grid (step 1): X = 10 * my step + opponent step, win_prob likewise
+POLICY = np.array([[0, 1, 2], [10, 11, 12], [20, 21, 22]], dtype=np.int16)
+WIN_PROB = POLICY / 100
+
+
+@pytest.fixture
+def table(tmp_path):
+    source = str(tmp_path / "value_iteration.npz")
+    np.savez(source, policy=POLICY, win_prob=WIN_PROB, x_values=np.arange(0, 30, 5))
+    return policy.load_table(source)
+
+
+@pytest.mark.parametrize("interpolate", [True, False])
+def test_grid_point(table, interpolate):
+    assert table.lookup(1, [2], interpolate) == (12, pytest.approx(0.12))
+    assert table.lookup(2, [2], interpolate) == (22, pytest.approx(0.22))  # Top edge of the grid
+
+
+def test_midpoint_interpolates_and_rounds_half_up(table):
+    # Mean of 0, 1, 10 and 11
+    x, p = table.lookup(0.5, [0.5])
+    assert (x, p) == (6, pytest.approx(0.055))
+    assert table.lookup(0.5, [0.5], interpolate=False) == (0, pytest.approx(0.0))
+
+
+def test_out_of_range_scores_clamp_to_the_grid(table):
+    assert table.lookup(-5, [100]) == (2, pytest.approx(0.02))
+    assert table.lookup(300, [-1], interpolate=False) == (20, pytest.approx(0.2))
+
+
+@pytest.mark.parametrize("interpolate", [True, False])
+def test_batch_matches_single_lookups(table, interpolate):
+    queries = [(1, [2]), (2, [2]), (0.5, [0.5]), (-5, [100]), (1.25, [1.75]), (300, [-1])]
+    xs, ps = table.lookup_batch([q[0] for q in queries], [q[1] for q in queries], interpolate)
+    expected = [table.lookup(me, opponents, interpolate) for me, opponents in queries]
+    assert xs.tolist() == [x for x, _ in expected]
+    assert ps.tolist() == pytest.approx([p for _, p in expected])
+
+
+def test_bad_queries_are_rejected(table):
+    with pytest.raises(ValueError, match="no queries"):
+        table.lookup_batch([], [])
+    with pytest.raises(ValueError, match="opponent"):
+        table.lookup(1, [1, 2])
+
+
+def test_single_step_table_is_rejected(tmp_path):
+    source = str(tmp_path / "value_iteration.npz")
+    np.savez(source, policy=np.zeros((1, 1), dtype=np.int16), win_prob=np.zeros((1, 1)), x_values=np.arange(5))
+    with pytest.raises(ValueError, match="at least 2"):
+        policy.load_table(source)
+
+
+def test_stdin_answers_every_line(table):
+    stdout = io.StringIO()
+    policy.serve_stdin(table, stdin=io.StringIO("1 2\n\nx\n"), stdout=stdout)
+    lines = stdout.getvalue().split("\n")
+    assert lines[:2] == ["12 0.120000", ""]
+    assert lines[2].startswith("error ")
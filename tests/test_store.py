@@ -0,0 +1,76 @@
+"""
+Tests of the columnar result store's on-disk format.
+"""
+
+import os
+import random
+
+import numpy as np
+
+import store
+from sim import records_to_columns, columns_to_records, run_simulation
+
+
+def _records(n, seed=0):
+    random.seed(seed)
+    return [run_simulation(x) for x in range(n)]
+
+
+def test_records_round_trip(tmp_path):
+    path = str(tmp_path / "results")
+    records = _records(50)
+    store.append(path, records_to_columns(records[:20]))
+    store.append(path, records_to_columns(records[20:]))
+
+    assert store.count_rows(path) == 50
+    assert list(columns_to_records(store.read(path))) == records
+    assert store.read(path, ["total_value"])["total_value"].tolist() == [r["total_value"] for r in records]
+
+
+def test_torn_append_is_trimmed(tmp_path):
+    path = str(tmp_path / "results")
+    records = _records(30)
+    store.append(path, records_to_columns(records[:10]))
+
+    # An append interrupted mid-row: one column got 4 rows and part of a
+    # fifth, another only part of its first row
+    row = records_to_columns(records[10:15])
+    with open(os.path.join(path, "cards.bin"), "ab") as f:
+        f.write(row["cards"].tobytes()[:4 * store.MAX_HAND_SIZE + 3])
+    with open(os.path.join(path, "total_value.bin"), "ab") as f:
+        f.write(row["total_value"].tobytes()[:1])
+
+    assert store.count_rows(path) == 10
+    columns = store.read(path)
+    assert all(len(column) == 10 for column in columns.values())
+    assert list(columns_to_records(columns)) == records[:10]
+
+    # The next append drops the leftover bytes before writing
+    store.append(path, records_to_columns(records[10:30]))
+    for name in store.COLUMNS:
+        size = os.path.getsize(os.path.join(path, f"{name}.bin"))
+        assert size == 30 * store._row_bytes(name)
+    assert list(columns_to_records(store.read(path))) == records
+
+
+def test_summary_goes_stale_when_rows_change(tmp_path):
+    path = str(tmp_path / "results")
+    records = _records(40)
+    store.append(path, records_to_columns(records[:25]))
+    summary = store.read_summary(path)
+    assert summary is not None and summary.count == 25
+
+    # Rows written without the sidecar being updated, as by an append
+    # interrupted between the column files and summary.json
+    extra = records_to_columns(records[25:])
+    for name in store.COLUMNS:
+        with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+            f.write(np.ascontiguousarray(extra[name], dtype=store.COLUMNS[name][0]).tobytes())
+    assert store.count_rows(path) == 40
+    assert store.read_summary(path) is None
+
+    # The next append rebuilds it from every row
+    store.append(path, records_to_columns(records[:5]))
+    summary = store.read_summary(path)
+    assert summary.count == 45
+    assert summary.to_summary() == store.aggregate(path).to_summary()
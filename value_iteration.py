@@ -0,0 +1,164 @@
+"""
+value_iteration.py - Full-resolution solver for the two-player game.
+
+multisim.py rounds scores down to 10s, caps them at 190 and falls back to a
+0.5 win probability for unsolved states.  This module instead solves every
+exact score pair (a, b) in 0..199 x 0..199, with the win probabilities held
+in dense NumPy arrays.
+
+The hand score distribution of STRAT(X) is state independent, so the value
+of P1 playing X at (a, b) against P2 playing Y is
+
+    V = sum over s1, s2 of P_X[s1] * P_Y[s2] * W[a + s1, b + s2]
+
+where W is the value array extended past 200 with the terminal outcomes.
+That is one (score x score) window of W contracted with both PMFs, and the
+windows of a whole anti-diagonal are evaluated in one einsum.
+
+Every successor of (a, b) has a larger score sum except (a, b) itself,
+reached when both hands score 0.  That self-loop is solved per state:
+V = E / (1 - P_X[0] * P_Y[0]), where E is the value over every other
+outcome.
+
+P2's strategy follows multisim: P2 plays P1's optimal strategy at the
+mirrored state (b, a) if that is already solved, else STRAT(25).  As in
+multisim.wavefronts, each diagonal is solved in two vectorized phases,
+a <= b (against STRAT(25)) and then a > b (against the mirrors just solved).
+A mirror best-response fixed point is not used: the game at a single state
+is a simultaneous race, and pure best responses commonly cycle.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from tqdm import tqdm
+
+from pmf_cache import score_pmf
+from multisim import X_VALUES, SCORE_STEPS, WIN_THRESHOLD, DEFAULT_P2_X, save_results
+from sim import DATA_DIR, parse_x_values
+
+RESULTS_PATH = os.path.join(DATA_DIR, "value_iteration_results.json")
+ARRAYS_PATH = os.path.join(DATA_DIR, "value_iteration.npz")
+
+
+def score_pmfs(x_values, **rules):
+    """
+    Returns a (len(x_values), size) array whose rows are the exact score
+    PMFs of STRAT(X), zero padded to a common length.  rules are the
+    deck_counts and flip_seven_bonus of pmf_cache.score_pmf.
+    """
+    pmfs = [score_pmf(x, **rules) for x in x_values]
+    size = max(len(pmf) for pmf in pmfs)
+    return np.array([np.pad(pmf, (0, size - len(pmf))) for pmf in pmfs])
+
+
+def extended_values(size, win_threshold=WIN_THRESHOLD):
+    """
+    Returns the value array extended by size - 1 scores past the win
+    threshold: P1 wins when only P1 crossed it, loses when only P2 did,
+    and the higher score wins (ties count half) when both did.  Entries
+    below the threshold start at zero and are filled in by solve().
+    """
+    scores = np.arange(win_threshold + size - 1)
+    a = scores[:, None]
+    b = scores[None, :]
+    p1_won = a >= win_threshold
+    p2_won = b >= win_threshold
+    both_value = np.where(a > b, 1.0, np.where(a == b, 0.5, 0.0))
+    return np.where(p1_won & p2_won, both_value, np.where(p1_won, 1.0, 0.0))
+
+
+def solve(x_values=X_VALUES, win_threshold=WIN_THRESHOLD, progress=True, **rules):
+    """
+    Solves the game at every score pair below win_threshold, with the hand
+    score distributions of the deck_counts and flip_seven_bonus in rules
+    (the standard game by default).
+
+    Returns:
+        policy: (T, T) int array, P1's optimal X at (p1_score, p2_score)
+        win_prob: (T, T) float array, P1's win probability there
+    """
+    x_values = np.asarray(x_values)
+    pmfs = score_pmfs(list(x_values) + [DEFAULT_P2_X], **rules)
+    default_pmf, pmfs = pmfs[-1], pmfs[:-1]
+    size = pmfs.shape[1]
+    p0 = pmfs[:, 0]
+
+    values_ext = extended_values(size, win_threshold)
+    windows = sliding_window_view(values_ext, (size, size))
+    policy = np.zeros((win_threshold, win_threshold), dtype=np.int64)
+    choice = np.zeros((win_threshold, win_threshold), dtype=np.int64)
+    win_prob = values_ext[:win_threshold, :win_threshold]  # a view, filled in place
+
+    totals = range(2 * (win_threshold - 1), -1, -1)
+    for total in tqdm(totals, desc="Value iteration", disable=not progress):
+        a = np.arange(max(0, total - win_threshold + 1), min(win_threshold - 1, total) + 1)
+        b = total - a
+        # Copies; the diagonal itself is still zero, so the self-loop term drops out of E
+        diagonal_windows = windows[a, b]
+
+        for mirror_solved, phase in ((False, a <= b), (True, a > b)):
+            pa, pb = a[phase], b[phase]
+            if not len(pa):
+                continue
+            if mirror_solved:
+                opponent = pmfs[choice[pb, pa]]
+            else:
+                opponent = np.broadcast_to(default_pmf, (len(pa), size))
+            expected = np.einsum("nij,nj->ni", diagonal_windows[phase], opponent) @ pmfs.T
+            denom = 1.0 - opponent[:, :1] * p0[None, :]
+            # Both players scoring 0 forever never ends the game; count it as a tie
+            value = np.divide(expected, denom, out=np.full_like(expected, 0.5), where=denom > 1e-12)
+
+            best = np.argmax(value, axis=1)
+            choice[pa, pb] = best
+            policy[pa, pb] = x_values[best]
+            win_prob[pa, pb] = value[np.arange(len(pa)), best]
+
+    return policy, win_prob.copy()
+
+
+def to_grid(policy, win_prob, score_steps=SCORE_STEPS):
+    """
+    Returns (optimal_strategies, win_probs) dicts at the score_steps grid
+    points, in the format of multisim.save_results.
+    """
+    optimal_strategies = {}
+    win_probs = {}
+    for p1 in score_steps:
+        for p2 in score_steps:
+            optimal_strategies[(p1, p2)] = int(policy[p1, p2])
+            win_probs[(p1, p2)] = float(win_prob[p1, p2])
+    return optimal_strategies, win_probs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-resolution Flip7 two-player solver")
+    parser.add_argument("--x", type=parse_x_values, default=X_VALUES,
+                        help='Candidate strategy thresholds, e.g. "0..100:5" (default) or "0..100"')
+    args = parser.parse_args()
+
+    start = time.time()
+    policy, win_prob = solve(args.x)
+    print(f"Solved {WIN_THRESHOLD * WIN_THRESHOLD} states in {time.time() - start:.1f}s")
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    np.savez_compressed(ARRAYS_PATH, x_values=np.asarray(args.x), policy=policy, win_prob=win_prob)
+    print(f"Full-resolution arrays saved to {ARRAYS_PATH}")
+
+    optimal_strategies, win_probs = to_grid(policy, win_prob)
+    save_results(
+        optimal_strategies, win_probs, method="value_iteration", filepath=RESULTS_PATH,
+        parameters={"x_values": [int(x) for x in args.x], "sims_per_strategy": None},
+    )
+
+    print("\nSample optimal strategies:")
+    for state in [(0, 0), (100, 100), (150, 100), (100, 150), (190, 190), (195, 195)]:
+        print(f"  State {state}: STRAT({policy[state]}), P1 win prob: {win_prob[state]:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+variants.py - Solve the two-player game under many rule variants in one job.
+
+    python variants.py variants.json
+    python variants.py variants.json --only to150,two_sc --workers 4
+
+The config is a JSON file listing the variants, with optional defaults
+applied to every one of them:
+
+    {
+        "defaults": {"x_values": "0..100:5"},
+        "variants": [
+            {"name": "standard"},
+            {"name": "to150", "win_threshold": 150},
+            {"name": "two_sc", "deck": {"SC": 2}},
+            {"name": "bonus25", "flip_seven_bonus": 25}
+        ]
+    }
+
+A variant may set
+    win_threshold     score that ends the game (default 200)
+    score_step        spacing of the saved grid (default 10)
+    x_values          candidate thresholds, a list or a string as for
+                      value_iteration.py --x (default 0..100:5)
+    deck              card counts replacing the standard deck's, keyed by
+                      card as in sim.CODE_TO_CARD, e.g. {"SC": 2, "12": 10}
+    flip_seven_bonus  bonus for seven numbers (default 15)
+
+A hand's score distribution only depends on the deck, the bonus and X, so
+the job first builds every distinct distribution once into pmf_cache, with
+one task per deck (each deck's exact state graph is also built once).  The
+variants are then solved in parallel with value_iteration.solve, reading
+the cached distributions: variants that differ only in the win threshold or
+the grid share all of their hand distributions, and a rerun only solves.
+
+Each variant's results go to data/variants/<name>/:
+    multisim_results.json   the grid in the multisim format, with the
+                            variant's rules in its parameters; render it with
+                            python analyze_multisim.py --results <path>
+    value_iteration.npz     the full-resolution policy and win probabilities
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+from tqdm import tqdm
+
+import value_iteration
+from multisim import X_VALUES, WIN_THRESHOLD, DEFAULT_P2_X, save_results
+from pmf_cache import score_pmf
+from sim import CARD_TO_CODE, DECK_COUNTS, FLIP_SEVEN_BONUS, DATA_DIR, parse_x_values
+
+VARIANTS_DIR = os.path.join(DATA_DIR, "variants")
+DEFAULT_SCORE_STEP = 10
+VARIANT_FIELDS = ("name", "win_threshold", "score_step", "x_values", "deck", "flip_seven_bonus")
+
+
+def get_variant_dir(name):
+    return os.path.join(VARIANTS_DIR, name)
+
+
+# -----------------------------------------------------------------------------
+# Config
+# -----------------------------------------------------------------------------
+
+
+def deck_counts(overrides):
+    """
+    Returns the standard DECK_COUNTS with the {card: count} overrides applied.
+    """
+    counts = list(DECK_COUNTS)
+    for card, count in overrides.items():
+        code = CARD_TO_CODE.get(int(card) if card.isdigit() else card)
+        if code is None:
+            raise ValueError(f"unknown card {card!r}")
+        if not isinstance(count, int) or count < 0:
+            raise ValueError(f"card count of {card!r} must be a non-negative integer")
+        counts[code] = count
+    return tuple(counts)
+
+
+def resolve_variant(spec, defaults=None):
+    """
+    Returns the settings of one variant from its config entry, with the
+    defaults (and then the standard rules) filling in what it leaves out.
+    """
+    settings = {**(defaults or {}), **spec}
+    unknown = sorted(set(settings) - set(VARIANT_FIELDS))
+    if unknown:
+        raise ValueError(f"unknown variant settings: {', '.join(unknown)}")
+    name = settings.get("name")
+    if not isinstance(name, str) or not re.fullmatch(r"[\w.-]+", name):
+        raise ValueError(f"variant names must be letters, digits, '_', '.' or '-', got {name!r}")
+
+    x_values = settings.get("x_values", X_VALUES)
+    if isinstance(x_values, str):
+        x_values = parse_x_values(x_values)
+    deck = {**(defaults or {}).get("deck", {}), **spec.get("deck", {})}
+    variant = {
+        "name": name,
+        "win_threshold": int(settings.get("win_threshold", WIN_THRESHOLD)),
+        "score_step": int(settings.get("score_step", DEFAULT_SCORE_STEP)),
+        "x_values": sorted(set(int(x) for x in x_values)),
+        "deck": deck,
+        "deck_counts": deck_counts(deck),
+        "flip_seven_bonus": int(settings.get("flip_seven_bonus", FLIP_SEVEN_BONUS)),
+    }
+    if variant["win_threshold"] < 1 or variant["score_step"] < 1:
+        raise ValueError(f"variant {name}: win_threshold and score_step must be positive")
+    return variant
+
+
+def load_config(path):
+    """Returns the resolved variants of a config file, in file order."""
+    with open(path, "r") as f:
+        config = json.load(f)
+    variants = [resolve_variant(spec, config.get("defaults")) for spec in config["variants"]]
+    names = [variant["name"] for variant in variants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate variant names: {', '.join(duplicates)}")
+    return variants
+
+
+# -----------------------------------------------------------------------------
+# Sweep
+# -----------------------------------------------------------------------------
+
+
+def distribution_tasks(variants):
+    """
+    Returns one (deck_counts, [(flip_seven_bonus, X)], variant names) task
+    per distinct deck, covering every distribution the variants need.
+    """
+    needed = defaultdict(set)
+    names = defaultdict(list)
+    for variant in variants:
+        rules = variant["deck_counts"]
+        for x in variant["x_values"] + [DEFAULT_P2_X]:
+            needed[rules].add((variant["flip_seven_bonus"], x))
+        names[rules].append(variant["name"])
+    return [(rules, sorted(needed[rules]), names[rules]) for rules in needed]
+
+
+def _distribution_task(task):
+    """Builds (or finds in pmf_cache) one deck's distributions."""
+    rules, distributions, names = task
+    try:
+        for flip_seven_bonus, x in distributions:
+            score_pmf(x, deck_counts=rules, flip_seven_bonus=flip_seven_bonus)
+    except ValueError as e:
+        raise ValueError(f"deck of variant {', '.join(names)}: {e}") from None
+    return len(distributions)
+
+
+def _solve_task(variant):
+    """Solves one variant; returns (variant, policy, win_prob, seconds)."""
+    start = time.time()
+    policy, win_prob = value_iteration.solve(
+        variant["x_values"], variant["win_threshold"], progress=False,
+        deck_counts=variant["deck_counts"], flip_seven_bonus=variant["flip_seven_bonus"],
+    )
+    return variant, policy, win_prob, time.time() - start
+
+
+def save_variant(variant, policy, win_prob):
+    """Writes a solved variant's results to its directory."""
+    directory = get_variant_dir(variant["name"])
+    os.makedirs(directory, exist_ok=True)
+    np.savez_compressed(os.path.join(directory, "value_iteration.npz"),
+                        x_values=np.asarray(variant["x_values"]), policy=policy, win_prob=win_prob)
+
+    score_steps = list(range(0, variant["win_threshold"], variant["score_step"]))
+    optimal_strategies, win_probs = value_iteration.to_grid(policy, win_prob, score_steps)
+    return save_results(
+        optimal_strategies, win_probs, method="value_iteration",
+        filepath=os.path.join(directory, "multisim_results.json"),
+        parameters={
+            "x_values": variant["x_values"],
+            "score_steps": score_steps,
+            "win_threshold": variant["win_threshold"],
+            "sims_per_strategy": None,
+            "variant": {
+                "name": variant["name"],
+                "deck": variant["deck"],
+                "flip_seven_bonus": variant["flip_seven_bonus"],
+            },
+        },
+    )
+
+
+def run_sweep(variants, workers=1):
+    """
+    Solves and saves every variant.  Returns {name: (P1's optimal X at
+    0-0, P1's win probability there, seconds spent solving)}.
+    """
+    tasks = distribution_tasks(variants)
+    n_distributions = sum(len(distributions) for _, distributions, _ in tasks)
+    print(f"{len(variants)} variants need {n_distributions} hand distributions over {len(tasks)} decks")
+
+    # Only the parent writes results, as the workers' outputs arrive
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    imap = pool.imap_unordered if pool else map
+    summary = {}
+    try:
+        with tqdm(total=n_distributions, desc="Distributions") as progress:
+            for n in imap(_distribution_task, tasks):
+                progress.update(n)
+        with tqdm(total=len(variants), desc="Variants") as progress:
+            for variant, policy, win_prob, seconds in imap(_solve_task, variants):
+                save_variant(variant, policy, win_prob)
+                summary[variant["name"]] = (int(policy[0, 0]), float(win_prob[0, 0]), seconds)
+                progress.update(1)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve the Flip7 two-player game under many rule variants")
+    parser.add_argument("config", help="JSON file listing the variants (see the module docstring)")
+    parser.add_argument("--only", type=lambda s: s.split(","), default=None,
+                        help="Comma-separated variant names to run (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    try:
+        variants = load_config(args.config)
+    except (OSError, KeyError, ValueError) as e:
+        parser.error(f"invalid config {args.config}: {e}")
+    if args.only:
+        unknown = sorted(set(args.only) - {variant["name"] for variant in variants})
+        if unknown:
+            parser.error(f"unknown variants: {', '.join(unknown)}")
+        variants = [variant for variant in variants if variant["name"] in args.only]
+
+    start = time.time()
+    try:
+        summary = run_sweep(variants, min(args.workers, len(variants)))
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"\nSolved {len(variants)} variants in {time.time() - start:.1f}s; results in {VARIANTS_DIR}/")
+
+    print("\nOpening move (P1 at 0-0):")
+    for variant in variants:
+        x, win_prob, seconds = summary[variant["name"]]
+        print(f"  {variant['name']:<20} STRAT({x}), P1 win prob: {win_prob:.2%}  ({seconds:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()